@@ -0,0 +1,63 @@
+# Import external libraries
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import module functions
+from twitter_preprocess import clean_twitter_data
+from benchmarks.synthetic import make_twitter_data
+
+'''
+Micro-benchmark: vectorized clean_twitter_data against the original per-row cleaning
+'''
+def legacy_clean_twitter_data(tw_data):
+  # Original row-by-row implementation, kept as the reference
+  tw_data = tw_data.dropna()
+  tw_data['text'] = tw_data['text'].apply(lambda x: re.sub(r'https?://\S+', '', x).strip())
+  tw_data['text'] = tw_data['text'].replace('\n', '', regex=True)
+  tw_data = tw_data[tw_data['text'] != '']
+  tw_data = tw_data.drop(tw_data[tw_data['text'].isna() | (tw_data['text'].str.strip() == '')].index)
+  tw_data = tw_data.drop(
+    tw_data[
+      (tw_data['quotes'] < 10) |
+      (tw_data['replies'] < 10) |
+      (tw_data['retweets'] < 10) |
+      (tw_data['bookmarks'] < 10) |
+      (tw_data['favorites'] < 10)
+    ].index
+  )
+  tw_data = tw_data.drop(tw_data[(tw_data['lang'] != 'en')].index)
+  return tw_data
+
+
+def best_of(func, tw_data, repeat):
+  best, result = float('inf'), None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = func(tw_data.copy())
+    best = min(best, time.perf_counter() - start)
+  return best, result
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser(description='Benchmark tweet cleaning')
+  cli.add_argument('--rows', type=int, default=1000000)
+  cli.add_argument('--repeat', type=int, default=3)
+  args = cli.parse_args()
+
+  tw_data = make_twitter_data(args.rows)
+
+  legacy_time, legacy = best_of(legacy_clean_twitter_data, tw_data, args.repeat)
+  vector_time, vector = best_of(clean_twitter_data, tw_data, args.repeat)
+
+  # Row selection and cleaned text must be identical
+  assert legacy.index.equals(vector.index)
+  assert legacy['text'].equals(vector['text'])
+
+  print(f"rows: {args.rows}, kept: {len(vector)}")
+  print(f"legacy:     {legacy_time:.3f}s")
+  print(f"vectorized: {vector_time:.3f}s ({legacy_time / vector_time:.1f}x)")
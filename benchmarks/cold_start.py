@@ -0,0 +1,74 @@
+# Import external libraries
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Import module functions
+from pipeline import STAGES
+
+'''
+Cold-start check: import time of each pipeline stage in a fresh interpreter
+'''
+# Import-time budget per stage in seconds; only training needs scikit-learn
+DEFAULT_BUDGET = 1.0
+COLD_START_BUDGET = {'train': 3.0}
+
+# Heavy libraries a stage must not load unless it uses them
+HEAVY_MODULES = ['sklearn', 'matplotlib', 'mplfinance', 'seaborn', 'flair', 'torch', 'vaderSentiment']
+ALLOWED_HEAVY = {'train': ['sklearn']}
+
+
+def profile_stage(name):
+  """Import one stage's function in a new interpreter; return (seconds, top-level imports, loaded modules)."""
+  code = (
+    "import sys, pipeline\n"
+    f"pipeline.stage_func(next(s for s in pipeline.STAGES if s.name == {name!r}))\n"
+    "print(' '.join(sys.modules))"
+  )
+  proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                        cwd=ROOT, capture_output=True, text=True, check=True)
+
+  # -X importtime lines: "import time: self [us] | cumulative | imported package";
+  # top-level imports have no indentation and their cumulative times add up to the total
+  imports = []
+  for line in proc.stderr.splitlines():
+    if not line.startswith('import time:') or 'imported package' in line:
+      continue
+    _, cumulative, package = line.split('|')
+    if not package.startswith('  '):
+      imports.append((package.strip(), int(cumulative) / 1e6))
+
+  modules = set(proc.stdout.split())
+  return sum(t for _, t in imports), imports, modules
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser(description='Report and check the cold-start import time of each stage')
+  cli.add_argument('--stages', nargs='+', default=[stage.name for stage in STAGES])
+  cli.add_argument('--top', type=int, default=5, help='slowest top-level imports to list per stage')
+  cli.add_argument('--repeat', type=int, default=3, help='keep the fastest of this many runs')
+  args = cli.parse_args()
+
+  failures = []
+  for name in args.stages:
+    runs = [profile_stage(name) for _ in range(args.repeat)]
+    total, imports, modules = min(runs, key=lambda run: run[0])
+    budget = COLD_START_BUDGET.get(name, DEFAULT_BUDGET)
+
+    print(f"{name}: {total:.3f}s (budget {budget:.1f}s)")
+    for package, seconds in sorted(imports, key=lambda item: item[1], reverse=True)[:args.top]:
+      print(f"  {seconds:7.3f}s  {package}")
+
+    if total > budget:
+      failures.append(f"{name} imports in {total:.3f}s, over its {budget:.1f}s budget")
+    loaded = [m for m in HEAVY_MODULES if m in modules and m not in ALLOWED_HEAVY.get(name, [])]
+    if loaded:
+      failures.append(f"{name} loads {', '.join(loaded)} at import")
+
+  for failure in failures:
+    print(f"FAIL: {failure}")
+  sys.exit(1 if failures else 0)
@@ -0,0 +1,99 @@
+# Import external libraries
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Import module functions
+from util.compiled_forest import CompiledForest
+
+'''
+Forest inference benchmark: scikit-learn (scaler + forest) against the compiled forest,
+checking that both give identical predictions before comparing their throughput
+'''
+# Features of the trained model: technical + sentiment + price + volatility
+N_FEATURES = 17
+
+
+def synthetic_model(rows, seed):
+  """Scaler, forest and feature names fit like model_train does, on seeded rows of mixed scales."""
+  from sklearn.preprocessing import StandardScaler
+  from util.random_forest import train_model
+
+  rng = np.random.default_rng(seed)
+  X = rng.normal(size=(rows, N_FEATURES)) * rng.uniform(0.01, 1e4, N_FEATURES) + rng.uniform(-1e3, 1e5, N_FEATURES)
+  signal = (X - X.mean(axis=0)) / X.std(axis=0)
+  y = (signal[:, :4].sum(axis=1) + rng.normal(size=rows) * 2 > 0).astype(int)
+
+  features = [f'f{i}' for i in range(N_FEATURES)]
+  X = pd.DataFrame(X, columns=features)
+  scaler = StandardScaler().fit(X)
+  model = train_model(scaler.transform(X), y)
+  return scaler, model, features
+
+
+def sample_rows(rows, scaler, seed, missing=0.0):
+  """Rows spread like the training data, with a share of missing values."""
+  rng = np.random.default_rng(seed + 1)
+  X = rng.normal(size=(rows, len(scaler.mean_))) * scaler.scale_ + scaler.mean_
+  X[rng.random(X.shape) < missing] = np.nan
+  return X
+
+
+def best_of(func, repeat):
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser(description='Compare scikit-learn and compiled random forest inference')
+  cli.add_argument('--model', default=None, help='artifact path (default: a forest trained on synthetic rows)')
+  cli.add_argument('--train-rows', type=int, default=5000)
+  cli.add_argument('--sizes', type=float, nargs='+', default=[1, 100, 1e4, 1e5], help='rows per predict call')
+  cli.add_argument('--missing', type=float, default=0.0, help='share of missing feature values')
+  cli.add_argument('--repeat', type=int, default=3)
+  cli.add_argument('--seed', type=int, default=0)
+  args = cli.parse_args()
+
+  if args.model is not None:
+    from util.serving import load_artifact
+    artifact = load_artifact(args.model)
+    scaler, model, features = artifact['scaler'], artifact['model'], artifact['features']
+  else:
+    scaler, model, features = synthetic_model(args.train_rows, args.seed)
+  model.n_jobs = 1
+
+  start = time.perf_counter()
+  compiled = CompiledForest(model, scaler)
+  print(f"Compiled {compiled.n_trees} trees, {len(compiled.feature)} nodes, depth {compiled.max_depth} "
+        f"in {time.perf_counter() - start:.3f}s")
+
+  def reference(X):
+    return model.predict_proba(scaler.transform(pd.DataFrame(X, columns=features)))
+
+  failures = []
+  for size in args.sizes:
+    X = sample_rows(int(size), scaler, args.seed, args.missing)
+    expected = reference(X)
+    if not np.array_equal(compiled.predict_proba(X), expected):
+      failures.append(f"predict_proba differs on {len(X)} rows")
+    if not np.array_equal(compiled.predict(X), model.classes_.take(np.argmax(expected, axis=1))):
+      failures.append(f"predict differs on {len(X)} rows")
+
+    sklearn_seconds = best_of(lambda: reference(X), args.repeat)
+    compiled_seconds = best_of(lambda: compiled.predict_proba(X), args.repeat)
+    print(f"{len(X):>8d} rows  sklearn {len(X) / sklearn_seconds:12.0f} rows/s  "
+          f"compiled {len(X) / compiled_seconds:12.0f} rows/s  ({sklearn_seconds / compiled_seconds:5.1f}x)")
+
+  for failure in failures:
+    print(f"FAIL: {failure}")
+  sys.exit(1 if failures else 0)
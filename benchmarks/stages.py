@@ -0,0 +1,164 @@
+# Import external libraries
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+import contextlib
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Import module functions
+import util.analysis as a
+from benchmarks.synthetic import make_price_data, make_twitter_data, span_days
+from price_preprocess import preprocess_price_data, rollup_price_data, convert2_daily_price
+from twitter_preprocess import preprocess_twitter_data, convert2_daily_data
+from data_merge import merge_data
+from feature_store import build_feature_store, load_features
+from util.rollup import query
+from model_train import train_random_forest_model
+
+'''
+Benchmark suite: time every pipeline stage function on seeded synthetic data
+'''
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Relative slowdown flagged as a regression by --compare, ignoring changes below
+# MIN_DELTA seconds that are within timer noise
+THRESHOLD = 0.2
+MIN_DELTA = 0.005
+
+
+def best_of(func, repeat):
+  """Fastest wall time of repeat calls, with the stage output silenced, and the last result."""
+  best, result = float('inf'), None
+  for _ in range(repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+      start = time.perf_counter()
+      result = func()
+      best = min(best, time.perf_counter() - start)
+  return best, result
+
+
+def run_size(n_rows, repeat, seed, n_jobs):
+  """Generate n_rows of price and tweet data in a scratch directory and time each stage on it."""
+  days = span_days(n_rows)
+  workdir = tempfile.mkdtemp(prefix='bench-')
+  cwd = os.getcwd()
+  timings = {}
+
+  try:
+    os.makedirs(os.path.join(workdir, 'data'))
+    os.makedirs(os.path.join(workdir, 'processed'))
+    make_price_data(n_rows, seed, days=days).to_csv(os.path.join(workdir, 'data', 'crytpo_data.csv'), index=False)
+    make_twitter_data(n_rows, seed, days=days).to_csv(os.path.join(workdir, 'data', 'twitter_data.csv'))
+    # Stage functions read data/ and write processed/ relative to the working directory
+    os.chdir(workdir)
+
+    timings['preprocess_price_data'], hr_btc = best_of(lambda: preprocess_price_data(), repeat)
+
+    prices = hr_btc[['price', 'open', 'close', 'dayHigh', 'dayLow']]
+    timings['calculate_technical_indicators'], _ = best_of(lambda: a.calculate_technical_indicators(prices), repeat)
+    # The single-candle shapes the price stage detects on the ticks
+    timings['detect_patterns_ticks'], _ = best_of(
+      lambda: a.detect_patterns(prices, close='price', single=True), repeat)
+
+    timings['preprocess_twitter_data'], tw_data = best_of(
+      lambda: preprocess_twitter_data(n_jobs=n_jobs, use_cache=False), repeat)
+    timings['convert2_daily_data'], v_day = best_of(lambda: convert2_daily_data(tw_data), repeat)
+    timings['rollup_price_data'], rollups = best_of(lambda: rollup_price_data(hr_btc), repeat)
+    # The full pattern catalog the daily stage detects on the rollup's daily bars
+    timings['query_daily_patterns'], _ = best_of(lambda: query('1D', pyramid=rollups, with_patterns=True), repeat)
+    timings['convert2_daily_price'], day_btc = best_of(lambda: convert2_daily_price(rollups), repeat)
+    timings['merge_data'], day_btc_tw = best_of(lambda: merge_data(day_btc, v_day), repeat)
+    timings['build_feature_store'], bars = best_of(lambda: build_feature_store(hr_btc, tw_data), repeat)
+    timings['load_features'], _ = best_of(lambda: load_features('6h', price_bars=bars[0], sentiment_bars=bars[1]), repeat)
+    timings['train_random_forest_model'], _ = best_of(
+      lambda: train_random_forest_model(day_btc_tw, persist=False), repeat)
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+  return [{'function': name, 'rows': n_rows, 'seconds': seconds} for name, seconds in timings.items()]
+
+
+def environment():
+  """Versions and commit the timings were taken with."""
+  try:
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                            capture_output=True, text=True).stdout.strip() or None
+  except OSError:
+    commit = None
+  return {
+    'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    'commit': commit,
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'pandas': pd.__version__,
+    'machine': platform.machine(),
+    'cpus': os.cpu_count(),
+  }
+
+
+def compare(base_path, new_path, threshold=THRESHOLD, min_delta=MIN_DELTA):
+  """Print the timing change of every (function, rows) pair in both runs; return the regressions."""
+  with open(base_path) as f:
+    base = {(r['function'], r['rows']): r['seconds'] for r in json.load(f)['results']}
+  with open(new_path) as f:
+    new = {(r['function'], r['rows']): r['seconds'] for r in json.load(f)['results']}
+
+  regressions = []
+  for key in sorted(base.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+    ratio = new[key] / base[key] if base[key] > 0 else float('inf')
+    flag = ''
+    if ratio > 1 + threshold and new[key] - base[key] > min_delta:
+      flag = '  REGRESSION'
+      regressions.append(key)
+    print(f"{key[0]:32s} {key[1]:>10d} rows  {base[key]:9.4f}s -> {new[key]:9.4f}s  ({ratio:.2f}x){flag}")
+
+  return regressions
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser(description='Benchmark every pipeline stage on synthetic data')
+  cli.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5],
+                   help='rows of price ticks and of tweets per run, 1e3 to 1e7')
+  cli.add_argument('--repeat', type=int, default=3)
+  cli.add_argument('--seed', type=int, default=0)
+  cli.add_argument('--n-jobs', type=int, default=None, help='VADER worker processes')
+  cli.add_argument('--output', default=None, help='results file (default: benchmarks/results/<time>.json)')
+  cli.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), default=None,
+                   help='compare two results files instead of running, exiting 1 on regressions')
+  cli.add_argument('--threshold', type=float, default=THRESHOLD,
+                   help='relative slowdown flagged as a regression')
+  cli.add_argument('--min-delta', type=float, default=MIN_DELTA,
+                   help='slowdowns smaller than this many seconds are never flagged')
+  args = cli.parse_args()
+
+  if args.compare is not None:
+    regressions = compare(*args.compare, threshold=args.threshold, min_delta=args.min_delta)
+    print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+  results = []
+  for size in args.sizes:
+    for row in run_size(int(size), args.repeat, args.seed, args.n_jobs):
+      print(f"{row['function']:32s} {row['rows']:>10d} rows  {row['seconds']:9.4f}s")
+      results.append(row)
+
+  output = args.output
+  if output is None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%dT%H%M%S') + '.json')
+  with open(output, 'w') as f:
+    json.dump({'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'results': results}, f, indent=2)
+  print(f"Saved results to {output}")
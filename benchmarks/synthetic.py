@@ -0,0 +1,78 @@
+# Import external libraries
+import numpy as np
+import pandas as pd
+
+'''
+Seeded synthetic data matching the schemas of data/crytpo_data.csv and data/twitter_data.csv
+'''
+_PHRASES = np.array([
+  'Bitcoin is going to the moon',
+  'BTC just crashed again, terrible day',
+  'Not sure about crypto right now',
+  'Buying more #bitcoin https://t.co/abc123',
+  'HODL!!! \nstill bullish',
+  'Sell everything, this is a bubble',
+  'Great analysis on BTC price action http://example.com/chart',
+  'https://t.co/onlyalink',
+  '   ',
+  'neutral update on the market',
+])
+
+_LANGS = np.array(['en', 'en', 'en', 'es', 'fr', 'ja'])
+
+
+def make_twitter_data(n_rows, seed=0, start='2024-10-28', days=100):
+  """Generate n_rows synthetic tweets with the raw twitter_data.csv columns."""
+  rng = np.random.default_rng(seed)
+  times = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days * 86400, n_rows), unit='s')
+
+  # Heavy-tailed engagement counts so the >= 10 filter keeps a realistic share
+  engagement = {
+    col: np.floor(rng.lognormal(2.5, 1.2, n_rows)).astype('int64')
+    for col in ['quotes', 'replies', 'retweets', 'bookmarks', 'favorites']
+  }
+
+  tw_data = pd.DataFrame({
+    'id': np.arange(n_rows),
+    'text': _PHRASES[rng.integers(0, len(_PHRASES), n_rows)],
+    'time': times.strftime('%Y-%m-%d %H:%M:%S'),
+    **engagement,
+    'lang': _LANGS[rng.integers(0, len(_LANGS), n_rows)],
+  })
+  tw_data.index.name = 'index'
+
+  return tw_data
+
+
+def span_days(n_rows):
+  """Days covered by n_rows synthetic rows: about hourly data, at least 100 and at most 3650 days."""
+  return int(np.clip(n_rows // 24, 100, 3650))
+
+
+def make_price_data(n_rows, seed=0, start='2024-10-28', days=None):
+  """Generate n_rows synthetic price ticks with the raw crytpo_data.csv columns, newest first."""
+  rng = np.random.default_rng(seed)
+  days = days or span_days(n_rows)
+  offsets = np.sort(rng.choice(days * 86400, size=n_rows, replace=n_rows > days * 86400))
+  times = pd.Timestamp(start) + pd.to_timedelta(offsets, unit='s')
+
+  # Geometric random walk around the sample's price level
+  price = 70000 * np.exp(np.cumsum(rng.normal(0, 0.003, n_rows)))
+  spread = np.abs(rng.normal(0, 0.02, (2, n_rows)))
+  day_open = pd.Series(price).groupby(times.floor('D')).transform('first').to_numpy()
+
+  btc_data = pd.DataFrame({
+    '_id': [f'{i:024x}' for i in range(n_rows)],
+    'symbol': 'BTC',
+    'name': 'Bitcoin USD',
+    'price': price.round(2),
+    'dayHigh': (price * (1 + spread[0])).round(2),
+    'dayLow': (price * (1 - spread[1])).round(2),
+    'volume': np.floor(rng.lognormal(25, 0.3, n_rows)),
+    'open': day_open.round(2),
+    'close': day_open.round(2),
+    'timestamp': (times - pd.Timestamp(0)) // pd.Timedelta(seconds=1),
+    'time': times.strftime('%Y-%m-%d %H:%M:%S.%f'),
+  })
+
+  return btc_data.iloc[::-1].reset_index(drop=True)
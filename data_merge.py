@@ -1,30 +1,24 @@
-# Import external libraries
-import numpy as np
-import pandas as pd
-import math
+# Import utility functions
+from util.storage import save_frame, replace_frame_tail
 
-def merge_data(day_btc, v_day_mean, v_day_med):
-  # Merge daily btc_data with tw_data using sentiment mean values
-  day_btc_tw = pd.merge(day_btc, v_day_mean, on='time')
+def merge_data(day_btc, v_day, since=None, persist=True):
+  # Attach the daily sentiment statistics with one join on its sorted day index.
+  # Sentiment keyed by symbol joins on (time, symbol); market-wide sentiment applies to every symbol.
+  if 'symbol' in v_day.columns and 'symbol' in day_btc.columns:
+    day_btc_tw = day_btc.join(v_day.set_index('symbol', append=True), on=['time', 'symbol'], how='inner')
+  else:
+    day_btc_tw = day_btc.join(v_day, on='time', how='inner')
+  day_btc_tw = day_btc_tw.reset_index(drop=True)
 
-  day_btc_tw = day_btc_tw.rename(columns={
-    "vd_positive": "vd_positive_mean",
-    'vd_neutral': "vd_neutral_mean",
-    "vd_negative": "vd_negative_mean",
-    "vd_compound": "vd_compound_mean",
-  })
+  # Keep the days with complete price and sentiment data; a day with a single tweet
+  # has no standard deviation, which does not disqualify it
+  required = [col for col in day_btc_tw.columns if not col.endswith('_std')]
+  day_btc_tw = day_btc_tw.dropna(subset=required)
 
-  # Merge btc_data with tw_data using sentiment median values
-  day_btc_tw = pd.merge(day_btc_tw, v_day_med, on='time')
+  # Save the daily data
+  if since is not None:
+    replace_frame_tail(day_btc_tw, 'day_btc_tw', 'time', since)
+  elif persist:
+    save_frame(day_btc_tw, 'day_btc_tw')
 
-  # Rename columns
-  day_btc_tw = day_btc_tw.rename(columns={
-    "vd_positive": "vd_positive_med",
-    'vd_neutral': "vd_neutral_med",
-    "vd_negative": "vd_negative_med",
-    "vd_compound": "vd_compound_med",
-  })
-
-  # Save the daily data to a CSV file if needed
-  day_btc_tw = day_btc_tw.dropna()
-  day_btc_tw.to_csv('./processed/day_btc_tw.csv', index=False)
+  return day_btc_tw
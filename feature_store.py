@@ -0,0 +1,160 @@
+# Import external libraries
+import pandas as pd
+# Import utility functions
+import util.vader as t
+from util.indicators import INDICATOR_COLUMNS
+from util.instrument import span
+from util.storage import save_frame, load_frame, load_frame_tail, load_frame_range, replace_frame_tail
+
+'''
+Feature Store
+Price bars per symbol and market-wide sentiment bars at a base granularity (hourly by default).
+Every bar is labelled with the time it closes, so a bar labelled T only holds data from before T.
+Queries roll the base bars up to any coarser resolution and attach sentiment with a backward
+as-of join, so a row never sees a tweet or tick from after its own time.
+'''
+# Granularity of the stored bars
+FEATURE_FREQ = '1h'
+
+# Sentiment older than this is not carried forward into bars without tweets
+SENTIMENT_TTL = '1D'
+
+# Hourly columns the price bars are built from
+PRICE_SOURCE_COLUMNS = ['timestamp', 'symbol', 'price', 'volume', 'dayHigh', 'dayLow'] + INDICATOR_COLUMNS
+
+# Aggregation of a price bar from ticks, or of a coarser bar from finer ones; the indicators
+# and 24h figures are taken as of the bar close
+PRICE_BAR_AGG = {
+  'open': 'first',
+  'price': 'last',
+  'high': 'max',
+  'low': 'min',
+  'volume': 'last',
+  'dayHigh': 'last',
+  'dayLow': 'last',
+  'ticks': 'sum',
+  **{col: 'last' for col in INDICATOR_COLUMNS},
+}
+
+# Sentiment columns served with every feature row
+SENTIMENT_FEATURES = [col + '_mean' for col in t.VADER_COLUMNS] + ['tweet_count']
+
+
+def _bar_close(times, freq):
+  """Label of the bar holding each time: the end of its freq interval."""
+  return times.dt.floor(freq) + freq
+
+
+def build_feature_store(hr_btc=None, tw_data=None, since=None, persist=True, feature_freq=FEATURE_FREQ):
+  freq = pd.Timedelta(feature_freq)
+
+  # In incremental mode rebuild the bars from the one holding `since`, which may start before it
+  first_label = None
+  if since is not None:
+    start = pd.Timestamp(since).floor(freq)
+    first_label = start + freq
+    ticks = load_frame_tail('hourly_btc_tw_data', 'timestamp', start, columns=PRICE_SOURCE_COLUMNS)
+    tweets = load_frame_tail('processed_twitter_data', 'time', start, columns=['time'] + t.VADER_COLUMNS)
+  else:
+    if hr_btc is not None:
+      ticks = hr_btc.reset_index()[PRICE_SOURCE_COLUMNS]
+    else:
+      ticks = load_frame('hourly_btc_tw_data', columns=PRICE_SOURCE_COLUMNS)
+    if tw_data is not None:
+      tweets = tw_data[['time'] + t.VADER_COLUMNS]
+    else:
+      tweets = load_frame('processed_twitter_data', columns=['time'] + t.VADER_COLUMNS)
+
+  # Price bars: OHLC from the tick prices, everything else as of the bar close
+  with span('feature_price_bars', len(ticks)) as record:
+    label = _bar_close(pd.to_datetime(ticks['timestamp']), freq).rename('time')
+    ticks = ticks.assign(open=ticks['price'], high=ticks['price'], low=ticks['price'], ticks=1)
+    price_bars = ticks.groupby(['symbol', label], observed=True).agg(PRICE_BAR_AGG).reset_index()
+    price_bars = price_bars.sort_values(['time', 'symbol'], kind='stable').reset_index(drop=True)
+    record['rows_out'] = len(price_bars)
+
+  # Sentiment bars: score sums and tweet counts, so coarser bars can be rolled up exactly
+  with span('feature_sentiment_bars', len(tweets)) as record:
+    label = _bar_close(pd.to_datetime(tweets['time'], format='mixed'), freq).rename('time')
+    stats = {col + '_sum': (col, 'sum') for col in t.VADER_COLUMNS}
+    stats['tweet_count'] = (t.VADER_COLUMNS[0], 'size')
+    sentiment_bars = tweets.groupby(label).agg(**stats).reset_index()
+    record['rows_out'] = len(sentiment_bars)
+
+  if first_label is not None:
+    price_bars = price_bars[price_bars['time'] >= first_label].reset_index(drop=True)
+    sentiment_bars = sentiment_bars[sentiment_bars['time'] >= first_label].reset_index(drop=True)
+    replace_frame_tail(price_bars, 'feature_price', 'time', first_label)
+    replace_frame_tail(sentiment_bars, 'feature_sentiment', 'time', first_label)
+  elif persist:
+    save_frame(price_bars, 'feature_price')
+    save_frame(sentiment_bars, 'feature_sentiment')
+
+  return price_bars, sentiment_bars
+
+
+def rollup(bars, resolution, feature_freq=FEATURE_FREQ):
+  """Aggregate base price or sentiment bars into bars of a coarser resolution."""
+  freq, resolution = pd.Timedelta(feature_freq), pd.Timedelta(resolution)
+  if resolution == freq:
+    return bars
+  if resolution < freq or resolution % freq:
+    raise ValueError(f"Resolution {resolution} is not a multiple of the store granularity {freq}")
+
+  # A base bar belongs to the coarser bar its own interval falls in
+  label = _bar_close(bars['time'] - freq, resolution).rename('time')
+  if 'symbol' in bars.columns:
+    agg = {col: how for col, how in PRICE_BAR_AGG.items() if col in bars.columns}
+    rolled = bars.groupby(['symbol', label], observed=True).agg(agg).reset_index()
+    return rolled.sort_values(['time', 'symbol'], kind='stable').reset_index(drop=True)
+  return bars.drop(columns='time').groupby(label).sum().reset_index()
+
+
+def _select(bars, start, end):
+  mask = pd.Series(True, index=bars.index)
+  if start is not None:
+    mask &= bars['time'] >= pd.Timestamp(start)
+  if end is not None:
+    mask &= bars['time'] < pd.Timestamp(end)
+  return bars[mask]
+
+
+def load_features(resolution=None, start=None, end=None, symbols=None, price_bars=None, sentiment_bars=None,
+                  feature_freq=FEATURE_FREQ, sentiment_ttl=SENTIMENT_TTL):
+  """Point-in-time feature rows, one per symbol and bar of `resolution`, with start <= time < end.
+
+  Bars are read from processed/ unless handed over in memory. Each row carries the mean
+  sentiment of the latest bar with tweets that closed no later than the row itself and no
+  more than sentiment_ttl before it, and the number of tweets inside the row's own bar.
+  """
+  resolution = pd.Timedelta(resolution or feature_freq)
+  ttl = pd.Timedelta(sentiment_ttl)
+
+  # Base bars reaching one coarse bar before start, plus the sentiment the as-of join may fall back to
+  price_start = pd.Timestamp(start) - resolution if start is not None else None
+  sentiment_start = price_start - ttl if price_start is not None else None
+  if price_bars is None:
+    price_bars = load_frame_range('feature_price', 'time', price_start, end)
+  if sentiment_bars is None:
+    sentiment_bars = load_frame_range('feature_sentiment', 'time', sentiment_start, end)
+  price_bars = _select(price_bars, price_start, end)
+  sentiment_bars = _select(sentiment_bars, sentiment_start, end)
+  if symbols is not None:
+    price_bars = price_bars[price_bars['symbol'].isin(symbols)]
+
+  with span('load_features', len(price_bars)) as record:
+    features = _select(rollup(price_bars, resolution, feature_freq), start, end)
+    sentiment = rollup(sentiment_bars, resolution, feature_freq)
+
+    # Mean scores of the bars that had tweets, joined backwards in time
+    counts = sentiment['tweet_count']
+    means = sentiment.loc[counts > 0, ['time']]
+    for col in t.VADER_COLUMNS:
+      means[col + '_mean'] = sentiment[col + '_sum'] / counts
+    features = pd.merge_asof(features, means, on='time', direction='backward', tolerance=ttl)
+
+    # Tweets inside each bar, zero for bars without any
+    features['tweet_count'] = features['time'].map(sentiment.set_index('time')['tweet_count']).fillna(0)
+    record['rows_out'] = len(features)
+
+  return features.reset_index(drop=True)
@@ -1,57 +1,113 @@
 import sys
-# Import external libraries
-import numpy as np
-import pandas as pd
-import math
-import time
-import datetime
-# import mplfinance as mpf
-from dateutil import parser
-import re
+import argparse
 # Import utility functions
-import util.analysis as a
-import util.vader as t
+from util.state import load_state, save_state
+import util.storage as storage
+import util.instrument as instrument
 
 # Import module functions
-from price_preprocess import preprocess_price_data, convert2_daily_price
-from twitter_preprocess import preprocess_twitter_data, convert2_daily_data
-from data_merge import merge_data
-from model_train import train_random_forest_model
+from pipeline import (STAGES, PREPROCESS_STAGES, DAILY_STAGES, run_pipeline, affected_since, downstream_stages,
+                      stage_fingerprints, plan_stages, cacheable_stages, load_stage_cache, save_stage_cache)
 
 if __name__ == '__main__': 
 
-  '''
-  Price and Twitter sentiment data preprocessing
-  '''
-  # Bitcoin Price Analysis
-  preprocess_price_data()
-
-  # Twitter Sentimental Analysis
-  preprocess_twitter_data()
-
-  # Continue Preprocess VADER Twitter Sentiment Data
-  v_day_mean, v_day_med = convert2_daily_data()
-
-  # Find Correlation between Bitcoin Price Movemnent VS. Twitter Sentiment
-  day_btc = convert2_daily_price()
-
-  # Merge daily btc_data with tw_data using sentiment mean values
-  merge_data(day_btc, v_day_mean, v_day_med)
+  cli = argparse.ArgumentParser(description='Bitcoin price and Twitter sentiment pipeline')
+  cli.add_argument('--stages', nargs='+', choices=[stage.name for stage in STAGES], default=None,
+                      help='run only these stages (default: all); unselected inputs are read from processed/')
+  cli.add_argument('--force', action='store_true',
+                      help='run the selected stages even if their inputs, code and parameters are unchanged')
+  cli.add_argument('--executor', choices=['process', 'thread'], default='process',
+                      help='run the price and Twitter branches in worker processes or in threads')
+  cli.add_argument('--incremental', action='store_true',
+                      help='only process rows newer than the last run and append to processed/')
+  cli.add_argument('--storage', choices=['parquet', 'arrow', 'csv'], default=storage.STORAGE_FORMAT,
+                      help='file format of the processed/ intermediates')
+  cli.add_argument('--export-csv', action='store_true',
+                      help='also write CSV copies of the processed/ intermediates')
+  cli.add_argument('--no-persist', dest='persist', action='store_false',
+                      help='hand frames between stages in memory only, without writing processed/')
+  cli.add_argument('--chunksize', type=int, default=None,
+                      help='stream the raw CSVs in chunks of this many rows to bound memory')
+  cli.add_argument('--symbol-shards', type=int, default=None,
+                      help='compute price indicators in this many worker processes, whole symbols per worker')
+  cli.add_argument('--min-engagement', type=int, default=10,
+                      help='minimum quotes, replies, retweets, bookmarks and favorites a tweet needs')
+  cli.add_argument('--lang', default='en', help='language tweets must be written in')
+  cli.add_argument('--flair', action='store_true',
+                      help='also score tweets with the Flair sentiment model (fl_label, fl_score columns)')
+  cli.add_argument('--flair-batch-size', type=int, default=32,
+                      help='mini-batch size of Flair inference')
+  cli.add_argument('--tune', action='store_true',
+                      help='search random forest hyperparameters before training')
+  cli.add_argument('--walk-forward', choices=['expanding', 'sliding'], default=None,
+                      help='also evaluate the model with walk-forward folds over the daily history')
+  cli.add_argument('--feature-freq', default='1h',
+                      help='bar size of the feature store built from the hourly prices and tweets')
+  cli.add_argument('--resolution', default=None,
+                      help='train on feature-store bars of this size (e.g. 1h, 6h, 1D) instead of the merged daily rows')
+  cli.add_argument('--trace', default=instrument.TRACE_PATH,
+                      help='append per-stage and hot-path timing/memory records to this JSON-lines file')
+  cli.add_argument('--profile-dir', default=instrument.PROFILE_DIR,
+                      help='write a cProfile dump per stage into this directory')
+  args = cli.parse_args()
+  storage.set_format(args.storage)
+  instrument.configure(args.trace, args.profile_dir)
+
+  # High-water marks of the previous run; None rebuilds everything
+  state = load_state() if args.incremental else None
+
+  # Incremental runs append to processed/, so they always persist
+  persist = args.persist or args.incremental
+
+  params = dict(state=state, persist=persist, chunksize=args.chunksize, symbol_shards=args.symbol_shards,
+                min_engagement=args.min_engagement,
+                lang=args.lang, flair=args.flair, flair_batch_size=args.flair_batch_size, tune=args.tune,
+                walk_forward=args.walk_forward, feature_freq=args.feature_freq, resolution=args.resolution)
+
+  # Skip stages unchanged since their last successful run; incremental and in-memory
+  # runs always execute the selected stages
+  use_cache = persist and not args.incremental and not args.force
+  fingerprints = stage_fingerprints(**params)
+  cache = load_stage_cache() if use_cache else None
+  plan = plan_stages(STAGES, args.stages, fingerprints, cache)
+  if args.incremental:
+    # New rows appended by a preprocess stage advance its high-water mark, so every stage
+    # built from them has to run as well, or later runs would never see those rows
+    plan = downstream_stages(STAGES, plan)
+  skip = {stage.name for stage in STAGES} - plan
+  for name in fingerprints:
+    if name in skip and (args.stages is None or name in args.stages):
+      print(f"Stage {name}: unchanged, skipped")
 
   '''
-  Random Forest Model
+  Price and Twitter sentiment data preprocessing, daily aggregation, merge and Random Forest Model.
+  The price and Twitter branches run concurrently and join at the merge.
   '''
-  train_random_forest_model()
-
-
-
-
-
-
-
-
-
-
-  
-
-    
\ No newline at end of file
+  if state is None:
+    frames = run_pipeline(STAGES, skip=skip, executor=args.executor, **params)
+  else:
+    # Incremental runs preprocess first to find the first day whose daily rows must be recomputed
+    frames = run_pipeline(PREPROCESS_STAGES, skip=skip, executor=args.executor, **params)
+    since = affected_since(frames)
+    # Daily stages selected by name still run without new rows, rebuilt from processed/
+    selected_daily = args.stages is not None and any(stage.name in args.stages for stage in DAILY_STAGES)
+    if since is None and not selected_daily:
+      print("No new rows since the last run.")
+      sys.exit(0)
+    frames = run_pipeline(DAILY_STAGES, frames, skip=skip, executor=args.executor, since=since, **params)
+
+  # Remember what the finished stages were built from, leaving out stages that ran on the
+  # stored outputs of an outdated producer
+  if persist and not args.incremental:
+    cache = load_stage_cache()
+    cache.update((name, fingerprints[name]) for name in cacheable_stages(STAGES, plan, fingerprints, cache))
+    save_stage_cache(cache)
+
+  # Optional CSV export of columnar intermediates
+  if args.export_csv and persist and args.storage != 'csv':
+    for name in ['hourly_btc_tw_data', 'processed_twitter_data', 'day_btc_data', 'day_btc_tw']:
+      storage.export_csv(name)
+
+  # Record the high-water marks only once every stage has succeeded
+  if state is not None:
+    save_state(state)
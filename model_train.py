@@ -1,47 +1,102 @@
 # Import external libraries
-import numpy as np
 import pandas as pd
-import math
-import time
-import datetime
 # Import utility functions
 from util.train import split_data, scale_features
 from util.random_forest import train_model, evaluate_model
+from util.storage import load_frame
+from feature_store import FEATURE_FREQ, SENTIMENT_FEATURES, load_features
 
-def train_random_forest_model():
-  # Load and preprocess data
-  df = pd.read_csv('./processed/day_btc_tw.csv')
+# Feature sets
+technical_features = ['SMA_5', 'SMA_10', 'RSI', 'MACD']
+sentiment_features = ['vd_neutral_mean', 
+      'vd_negative_med', 'vd_neutral_med',
+      'vd_negative_mean',
+      'vd_positive_med', 'vd_compound_med', 'vd_compound_mean', 
+      'vd_positive_mean']
+price_features = ['price','volume', 'dayHigh', 'dayLow']
+
+def load_model_frame(day_btc_tw=None, price_bars=None, sentiment_bars=None, since=None, resolution=None,
+                     feature_freq=FEATURE_FREQ):
+  """Model rows indexed by time, with volatility and the next bar's price change, and their sentiment features."""
+  if resolution is None:
+    # Use the merged frame handed over in memory, or load only the feature columns
+    # (incremental runs only hand over the recomputed days, so they always load)
+    # 'price' is the day's mean; 'close' is kept as the price a backtest fills at
+    sentiment = sentiment_features
+    columns = ['time', 'symbol', 'close'] + technical_features + sentiment + price_features
+    if day_btc_tw is not None and since is None:
+      df = day_btc_tw[columns].copy()
+    else:
+      df = load_frame('day_btc_tw', columns=columns)
+  else:
+    # Roll the feature store up to the requested bar size; incremental runs only hand over
+    # the rebuilt bars, so they read the store
+    sentiment = SENTIMENT_FEATURES
+    if since is not None:
+      price_bars = sentiment_bars = None
+    df = load_features(resolution, price_bars=price_bars, sentiment_bars=sentiment_bars, feature_freq=feature_freq)
   df['time'] = pd.to_datetime(df['time'])
+
+  # Returns and next-bar changes are taken within each symbol, never across two of them
+  df = df.sort_values(['time', 'symbol'], kind='stable').reset_index(drop=True)
+  by_symbol = df.groupby('symbol', observed=True, sort=False)['price']
+  returns = by_symbol.pct_change()
+  volatility = returns.groupby(df['symbol'], observed=True, sort=False).rolling(window=10).std()
+  df['volatility'] = volatility.droplevel(0) * 100  # Rolling std dev of price changes
+  df['price_change'] = by_symbol.shift(-1) - df['price']  # Predict next bar's price
   df.set_index('time', inplace=True)
-  
-  # Feature sets
-  technical_features = ['SMA_5', 'SMA_10', 'RSI', 'MACD']
-  sentiment_features = ['vd_neutral_mean', 
-        'vd_negative_med', 'vd_neutral_med',
-        'vd_negative_mean',
-        'vd_positive_med', 'vd_compound_med', 'vd_compound_mean', 
-        'vd_positive_mean']
-  price_features = ['price','volume', 'dayHigh', 'dayLow']
 
-  df['volatility'] = df['price'].pct_change().rolling(window=10).std() * 100  # Rolling std dev of price changes
+  return df, sentiment
 
-  X = df[technical_features + sentiment_features + price_features + ['volatility']].copy()
-  y = df['price'].shift(-1)  # Predict next day's price 
+def model_rows(df, sentiment):
+  """Rows of a model frame with every feature present and their target, and the feature names."""
+  features = technical_features + sentiment + price_features + ['volatility']
 
   # Create a binary target variable: 1 if price increases, 0 if price decreases
-  df['price_change'] = df['price'].shift(-1) - df['price']
-  df['target'] = (df['price_change'] > 0).astype(int)  # 1 for increase, 0 for decrease
+  df = df.assign(target=(df['price_change'] > 0).astype(int))  # 1 for increase, 0 for decrease
 
-  # Remove NaN values from both X and y
-  df_clean = pd.concat([X, df['target'].rename('target')], axis=1).dropna()
+  # Remove rows with missing feature values
+  return df[df[features].notna().all(axis=1)], features
+
+def train_random_forest_model(day_btc_tw=None, price_bars=None, sentiment_bars=None, since=None, tune=False,
+                              walk_forward=None, persist=True, resolution=None, feature_freq=FEATURE_FREQ):
+  df, sentiment = load_model_frame(day_btc_tw, price_bars, sentiment_bars, since, resolution, feature_freq)
+  df_clean, features = model_rows(df, sentiment)
 
   # Ensure 'price' is a single Series
   if isinstance(df_clean['price'], pd.DataFrame):
       df_clean['price'] = df_clean['price'].iloc[:, 0]  # Select the first column
 
-  X_train, X_test, y_train, y_test = split_data(df_clean, technical_features, sentiment_features, price_features)
-  X_train_scaled, X_test_scaled = scale_features(X_train, X_test)
+  X_train, X_test, y_train, y_test = split_data(df_clean, technical_features, sentiment, price_features)
+  X_train_scaled, X_test_scaled, scaler = scale_features(X_train, X_test, return_scaler=True)
+
+  # Optionally search hyperparameters on the training split first
+  params = {}
+  if tune:
+    from util.tuning import tune_random_forest
+    params = tune_random_forest(X_train, y_train)['params']
+    print(f"Tuned parameters: {params}")
 
-  model = train_model(X_train_scaled, y_train)
+  model = train_model(X_train_scaled, y_train, **params)
   accuracy, precision, recall, f1, conf_matrix = evaluate_model(model, X_test_scaled, y_test)
 
+  # Keep the fitted scaler and model together so predictions no longer need a retrain
+  if persist:
+    from util.serving import save_artifact
+    path = save_artifact(scaler, model, list(X_train.columns), metadata={
+      'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1': f1,
+      'train_rows': len(X_train), 'test_rows': len(X_test), 'params': params,
+      'resolution': resolution,
+    })
+    print(f"Saved model artifact to {path}")
+
+  # Optionally evaluate with chronological walk-forward folds ('expanding' or 'sliding' windows)
+  if walk_forward is not None:
+    from util.walk_forward import walk_forward_evaluate
+    folds = walk_forward_evaluate(df_clean[features], df_clean['target'], window=walk_forward, **params)
+    print("\nWalk-forward Performance:")
+    print(folds.to_string(index=False))
+    print(folds[['accuracy', 'precision', 'recall', 'f1', 'fit_time', 'predict_time']].mean().to_string())
+
+
+  return model
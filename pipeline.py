@@ -0,0 +1,367 @@
+# Import external libraries
+import os
+import ast
+import json
+import time
+import hashlib
+import inspect
+import importlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait, as_completed
+
+# Import utility functions
+from util.memory import track_peak_memory
+from util.instrument import span, count_rows
+import util.instrument as instrument
+from util.state import load_state, save_state
+import util.storage as storage
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Fingerprints of the last successful run of every stage
+STAGE_CACHE_PATH = './processed/stage_cache.json'
+
+'''
+Stage graph
+Each stage takes its input frames positionally and returns its output frames;
+persistence to processed/ is an optional side-output controlled by `persist`.
+Stage functions are named as 'module.function' and only imported when the stage
+runs, so a run of one stage never loads the libraries of the others.
+`raw` lists the source files a stage reads outside of processed/.
+'''
+Stage = namedtuple('Stage', ['name', 'func', 'inputs', 'outputs', 'raw'], defaults=[()])
+
+PREPROCESS_STAGES = [
+  Stage('price', 'price_preprocess.preprocess_price_data', [], ['hr_btc'], ['data/crytpo_data.csv']),
+  Stage('twitter', 'twitter_preprocess.preprocess_twitter_data', [], ['tw_data'], ['data/twitter_data.csv']),
+]
+
+DAILY_STAGES = [
+  Stage('daily_sentiment', 'twitter_preprocess.convert2_daily_data', ['tw_data'], ['v_day']),
+  Stage('rollup', 'price_preprocess.rollup_price_data', ['hr_btc'], ['rollups']),
+  Stage('daily_price', 'price_preprocess.convert2_daily_price', ['rollups'], ['day_btc']),
+  Stage('merge', 'data_merge.merge_data', ['day_btc', 'v_day'], ['day_btc_tw']),
+  Stage('features', 'feature_store.build_feature_store', ['hr_btc', 'tw_data'], ['price_bars', 'sentiment_bars']),
+  Stage('train', 'model_train.train_random_forest_model', ['day_btc_tw', 'price_bars', 'sentiment_bars'], ['model']),
+]
+
+STAGES = PREPROCESS_STAGES + DAILY_STAGES
+
+# Independent chains of stages that share no frames until merge_data
+BRANCHES = {
+  'price': ['price', 'rollup', 'daily_price'],
+  'twitter': ['twitter', 'daily_sentiment'],
+}
+
+# Outputs persisted to processed/ that their consumers load themselves when handed None
+STORED_OUTPUTS = {
+  'hr_btc': 'hourly_btc_tw_data',
+  'tw_data': 'processed_twitter_data',
+  'day_btc_tw': 'day_btc_tw',
+  'rollups': 'rollup_1D',
+  'price_bars': 'feature_price',
+  'sentiment_bars': 'feature_sentiment',
+}
+
+# Directory of the saved model artifacts (util.serving.MODEL_DIR, not imported to keep sklearn out)
+MODEL_DIR = './models'
+
+
+def stage_func(stage):
+  """Import and return the function of a stage."""
+  if callable(stage.func):
+    return stage.func
+  module, name = stage.func.rsplit('.', 1)
+  return getattr(importlib.import_module(module), name)
+
+
+def _accepted(func, params):
+  """Keep only the keyword parameters a stage function accepts."""
+  accepted = inspect.signature(func).parameters
+  return {key: value for key, value in params.items() if key in accepted}
+
+
+def run_stage(stage, frames, **params):
+  """Run one stage on the frames produced so far and store its outputs in frames."""
+  func = stage_func(stage)
+  inputs = [frames.get(name) for name in stage.inputs]
+  with track_peak_memory(f"Stage {stage.name}") as memory, \
+       span(stage.name, count_rows(inputs), profile=True) as record:
+    result = func(*inputs, **_accepted(func, params))
+    record['rows_out'] = count_rows(result)
+    record['peak_rss_shared'] = memory['shared']
+
+  outputs = result if len(stage.outputs) > 1 else (result,)
+  frames.update(zip(stage.outputs, outputs))
+
+  return frames
+
+
+def _init_worker(storage_format, trace_path, profile_dir):
+  """Worker initializer: apply the main process's storage format and trace/profile settings.
+
+  Workers started with spawn or forkserver import the modules afresh, so settings made
+  at run time in the main process have to be handed over explicitly.
+  """
+  storage.set_format(storage_format)
+  instrument.configure(trace_path, profile_dir)
+
+
+def _run_branch(names, frames, params):
+  """Worker entry point: run the stages of one branch and return its outputs, state and wall time."""
+  start = time.perf_counter()
+  stages = [stage for stage in STAGES if stage.name in names]
+  run_pipeline(stages, frames, **params)
+
+  outputs = {name: frames[name] for stage in stages for name in stage.outputs}
+  return outputs, params.get('state'), time.perf_counter() - start
+
+
+def run_branches(stages, frames=None, skip=(), **params):
+  """Run the BRANCHES members among stages in one worker process per branch and join their outputs.
+
+  Stage state updates made in the workers are merged back into params['state']. When a
+  branch fails, the other one is allowed to finish so its stored outputs stay consistent,
+  then the failure is raised with the branch name.
+  """
+  frames = {} if frames is None else frames
+  names = {stage.name for stage in stages if stage.name not in skip}
+  branches = {branch: [name for name in members if name in names] for branch, members in BRANCHES.items()}
+  branches = {branch: members for branch, members in branches.items() if members}
+  if not branches:
+    return frames
+
+  state = params.get('state')
+  before = dict(state) if state is not None else None
+  start = time.perf_counter()
+  failure = None
+
+  settings = (storage.STORAGE_FORMAT, instrument.TRACE_PATH, instrument.PROFILE_DIR)
+  with ProcessPoolExecutor(max_workers=len(branches), initializer=_init_worker, initargs=settings) as pool:
+    futures = {}
+    for branch, members in branches.items():
+      # Hand each worker only the frames its stages read
+      inputs = {name: frames[name] for stage in STAGES if stage.name in members
+                for name in stage.inputs if frames.get(name) is not None}
+      futures[pool.submit(_run_branch, members, inputs, params)] = branch
+
+    for future in as_completed(futures):
+      branch = futures[future]
+      try:
+        outputs, branch_state, seconds = future.result()
+      except Exception as e:
+        print(f"Branch {branch}: failed ({type(e).__name__}: {e})")
+        failure = failure or (branch, e)
+        continue
+
+      print(f"Branch {branch}: {seconds:.2f}s")
+      frames.update(outputs)
+      if state is not None:
+        state.update({key: value for key, value in branch_state.items() if before.get(key) != value})
+
+  if failure is not None:
+    branch, e = failure
+    raise RuntimeError(f"Pipeline branch '{branch}' failed") from e
+
+  print(f"Branches joined after {time.perf_counter() - start:.2f}s")
+  return frames
+
+
+def run_pipeline(stages, frames=None, skip=(), max_workers=None, executor='thread', **params):
+  """Run stages as soon as the stages producing their inputs are done, handing frames in memory.
+
+  Independent stages run concurrently: in threads, or with executor='process' the price
+  and Twitter BRANCHES run in their own worker processes first and join before the
+  remaining stages. Stages named in `skip` are left out and their consumers fall back
+  to the stored outputs.
+  """
+  frames = {} if frames is None else frames
+  if executor == 'process':
+    run_branches(stages, frames, skip, **params)
+    branched = {name for members in BRANCHES.values() for name in members}
+    stages = [stage for stage in stages if stage.name not in branched]
+  elif executor != 'thread':
+    raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+
+  pending = [stage for stage in stages if stage.name not in skip]
+  producers = {name: stage.name for stage in pending for name in stage.outputs}
+  done = set()
+
+  with ThreadPoolExecutor(max_workers=max_workers or max(1, len(pending))) as pool:
+    running = {}
+    while pending or running:
+      for stage in [s for s in pending if all(producers.get(i, None) in done | {None} for i in s.inputs)]:
+        running[pool.submit(run_stage, stage, frames, **params)] = stage.name
+        pending.remove(stage)
+
+      finished, _ = wait(running, return_when=FIRST_COMPLETED)
+      for future in finished:
+        # Re-raise the first stage failure once the stages already running have finished
+        future.result()
+        done.add(running.pop(future))
+
+  return frames
+
+
+'''
+Stage cache
+A stage is skipped when its fingerprint (code, parameters, raw files and upstream
+fingerprints) matches the last successful run and its stored outputs still exist.
+'''
+def _module_path(module):
+  return os.path.join(ROOT, *module.split('.')) + '.py'
+
+
+def _local_imports(path):
+  """Repo modules imported anywhere in a source file, including function-level imports."""
+  with open(path, 'rb') as f:
+    tree = ast.parse(f.read())
+
+  names = set()
+  for node in ast.walk(tree):
+    if isinstance(node, ast.Import):
+      names.update(alias.name for alias in node.names)
+    elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+      names.add(node.module)
+  return {name for name in names if os.path.exists(_module_path(name))}
+
+
+def code_version(module):
+  """Hash of a module's source and of every repo module it imports, transitively."""
+  seen, queue = set(), [module]
+  while queue:
+    name = queue.pop()
+    if name not in seen:
+      seen.add(name)
+      queue.extend(_local_imports(_module_path(name)))
+
+  digest = hashlib.sha1()
+  for name in sorted(seen):
+    with open(_module_path(name), 'rb') as f:
+      digest.update(name.encode('utf-8') + b'\x00' + f.read())
+  return digest.hexdigest()
+
+
+def _parameter_names(stage):
+  """Keyword parameters of a stage function, read from its source without importing it."""
+  module, name = stage.func.rsplit('.', 1)
+  with open(_module_path(module), 'rb') as f:
+    tree = ast.parse(f.read())
+
+  func = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == name)
+  return {arg.arg for arg in func.args.args + func.args.kwonlyargs}
+
+
+def _raw_stat(path):
+  """Size and modification time of a raw file, or None when it is missing."""
+  try:
+    stat = os.stat(path)
+  except FileNotFoundError:
+    return None
+  return [stat.st_size, stat.st_mtime_ns]
+
+
+def stage_fingerprints(stages=STAGES, **params):
+  """Fingerprint of every stage; a change upstream changes the fingerprints of all later stages."""
+  fingerprints, producers = {}, {}
+  for stage in stages:
+    accepted = _parameter_names(stage)
+    payload = {
+      'code': code_version(stage.func.rsplit('.', 1)[0]),
+      'params': {key: value for key, value in sorted(params.items()) if key in accepted},
+      'raw': {path: _raw_stat(path) for path in stage.raw},
+      'upstream': [fingerprints.get(producers.get(name)) for name in stage.inputs],
+      'storage': storage.STORAGE_FORMAT,
+    }
+    fingerprints[stage.name] = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    producers.update((name, stage.name) for name in stage.outputs)
+
+  return fingerprints
+
+
+def plan_stages(stages=STAGES, selected=None, fingerprints=None, cache=None):
+  """Names of the stages to run.
+
+  Selected stages run unless their fingerprint matches the cache and their stored outputs
+  exist. A stage that will run pulls in the producers of any input it cannot load itself.
+  """
+  selected = {stage.name for stage in stages} if selected is None else set(selected)
+  by_output = {name: stage for stage in stages for name in stage.outputs}
+
+  def unchanged(stage):
+    if fingerprints is None or cache is None or cache.get(stage.name) != fingerprints[stage.name]:
+      return False
+    if 'model' in stage.outputs and not _artifact_exists():
+      return False
+    return all(storage.exists(STORED_OUTPUTS[name]) for name in stage.outputs if name in STORED_OUTPUTS)
+
+  plan = {stage.name for stage in stages if stage.name in selected and not unchanged(stage)}
+
+  # Walk backwards (stages are in dependency order) so a required producer is visited
+  # after its consumer and pulls in its own producers in turn
+  for stage in reversed(stages):
+    if stage.name not in plan:
+      continue
+    for name in stage.inputs:
+      producer = by_output.get(name)
+      if producer is None or producer.name in plan:
+        continue
+      if name not in STORED_OUTPUTS or not storage.exists(STORED_OUTPUTS[name]):
+        plan.add(producer.name)
+
+  return plan
+
+
+def _artifact_exists(model_dir=MODEL_DIR):
+  """Whether a saved model artifact exists, named as util.serving.save_artifact names them."""
+  return os.path.isdir(model_dir) and any(
+    f.startswith('random_forest_') and f.endswith('.joblib') for f in os.listdir(model_dir))
+
+
+def downstream_stages(stages, names):
+  """The named stages and every stage reading, directly or not, the outputs of one of them."""
+  names = set(names)
+  produced = {output for stage in stages if stage.name in names for output in stage.outputs}
+  # Stages are in dependency order, so one pass reaches every consumer
+  for stage in stages:
+    if stage.name not in names and produced.intersection(stage.inputs):
+      names.add(stage.name)
+      produced.update(stage.outputs)
+  return names
+
+
+def cacheable_stages(stages, plan, fingerprints, cache):
+  """Stages of the plan whose outputs were built from inputs matching their fingerprint.
+
+  A stage that ran on the stored outputs of a producer that did not run, and whose cached
+  fingerprint is stale, was built from outdated inputs; caching it would skip it later
+  even once its producer reran.
+  """
+  producers = {name: stage.name for stage in stages for name in stage.outputs}
+  current = set()
+  for stage in stages:
+    upstream = {producers[name] for name in stage.inputs if name in producers}
+    if stage.name in plan:
+      if all(name in current for name in upstream):
+        current.add(stage.name)
+    elif cache.get(stage.name) == fingerprints.get(stage.name):
+      current.add(stage.name)
+  return {name for name in plan if name in current}
+
+
+def load_stage_cache(path=STAGE_CACHE_PATH):
+  return load_state(path)
+
+
+def save_stage_cache(cache, path=STAGE_CACHE_PATH):
+  save_state(cache, path)
+
+
+def affected_since(frames):
+  """First day touched by the new price or tweet rows of an incremental run, or None if nothing is new."""
+  days = [
+    frames[name]['time'].min().floor('D')
+    for name in ('hr_btc', 'tw_data')
+    if frames.get(name) is not None and not frames[name].empty
+  ]
+  return min(days) if days else None
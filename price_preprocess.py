@@ -1,57 +1,100 @@
 # Import external libraries
 import numpy as np
 import pandas as pd
-import math
-import time
-import datetime
+from concurrent.futures import ProcessPoolExecutor
 
 # Import utility functions
 import util.analysis as a
+from util.indicators import StreamingIndicators
+from util.instrument import span
+from util.ingest import PRICE_DTYPES, read_chunks, concat_chunks
+from util.rollup import SOURCE_COLUMNS as ROLLUP_SOURCE_COLUMNS, build_pyramid, update_pyramid, query
+from util.storage import save_frame, load_frame, replace_frame_tail
+
 
 '''
 Bitcoin Price Analysis
 Data Loading and Preprocessing
+Every step works per symbol, so one run handles any number of coins.
 '''
-def preprocess_price_data():
-  # Read raw bitcoin dataset
-  btc_data = pd.read_csv("data/crytpo_data.csv", index_col = 0)
-
-  # Drop rows with missing values
-  btc_data = btc_data.dropna()
+def _indicator_values(prices):
+  """Indicator columns of a symbol/price frame as an (n, 10) array; runs in shard worker processes."""
+  return a.calculate_technical_indicators(prices, copy=False, by='symbol')[a.INDICATOR_COLUMNS].to_numpy()
+
+
+def _sharded_indicators(btc_data, shards):
+  """Indicators of every symbol, computed in up to `shards` worker processes with whole symbols per shard."""
+  symbols = btc_data['symbol'].unique()
+  prices = btc_data[['symbol', 'price']]
+  if shards is None or shards < 2 or len(symbols) < 2:
+    return _indicator_values(prices)
+
+  masks = [btc_data['symbol'].isin(part).to_numpy() for part in np.array_split(symbols, min(shards, len(symbols)))]
+  values = np.empty((len(btc_data), len(a.INDICATOR_COLUMNS)))
+  with ProcessPoolExecutor(max_workers=len(masks)) as pool:
+    for mask, shard_values in zip(masks, pool.map(_indicator_values, [prices[mask] for mask in masks])):
+      values[mask] = shard_values
+  return values
+
+
+def _load_indicator_states(saved, symbols):
+  """Streaming indicator state per symbol from the saved pipeline state."""
+  # State saved before prices were keyed by symbol holds a single series
+  if 'sma_5' in saved:
+    saved = {str(symbols[0]): saved}
+  return {symbol: StreamingIndicators.from_dict(data) for symbol, data in saved.items()}
+
+
+def preprocess_price_data(state=None, persist=True, chunksize=None, symbol_shards=None):
+  # In incremental mode keep only rows past the high-water mark
+  last_timestamp = state.get('price_timestamp') if state is not None and 'price_indicators' in state else None
+
+  # Read raw bitcoin dataset with explicit dtypes, chunk by chunk in streaming mode
+  chunks = []
+  for chunk in read_chunks("data/crytpo_data.csv", PRICE_DTYPES, chunksize):
+    # Drop rows with missing values
+    chunk = chunk.dropna()
+    if last_timestamp is not None:
+      chunk = chunk[chunk['timestamp'] > last_timestamp]
+    chunks.append(chunk)
+  btc_data = concat_chunks(chunks)
+  del chunks
+
+  if last_timestamp is not None and btc_data.empty:
+    return None
 
   # Convert the 'timestamp' column to datetime and set it as the index
   btc_data['timestamp'] = pd.to_datetime(btc_data['timestamp'], unit='s')
   btc_data = btc_data.set_index('timestamp').sort_index()  # Sort by timestamp in ascending order
 
-  # Resample to 6-hour intervals
-  daily_data = btc_data.resample('6h').agg({
-      'open': 'first',
-      'price': 'last',
-      'dayHigh': 'max',
-      'dayLow': 'min',
-      'volume': 'sum'
-  })
-
-  # Clean and rename columns for mplfinance
-  daily_data = daily_data.fillna(method='ffill').dropna()
-  daily_data = daily_data.rename(columns={
-      'price': 'Close',
-      'dayHigh': 'High',
-      'dayLow': 'Low',
-      'open': 'Open',
-      'volume': 'Volume'
-  })
-
-  # Add moving averages
-  daily_data['SMA5'] = daily_data['Close'].rolling(window=5, min_periods=1).mean()
-  daily_data['SMA10'] = daily_data['Close'].rolling(window=10, min_periods=1).mean()
-
-  # Example usage
-  df_with_indicators = a.calculate_technical_indicators(btc_data)
-
-  # If you want pattern detection (only if you have OHLC data):
-  if all(col in btc_data.columns for col in ['open', 'close', 'dayHigh', 'dayLow']):
-      df_with_indicators = a.detect_patterns(df_with_indicators)
+  # Row positions of every symbol, for the per-symbol streaming state
+  positions = {str(symbol): rows for symbol, rows in btc_data.groupby('symbol', observed=True).indices.items()}
+
+  with span('calculate_technical_indicators', len(btc_data)) as record:
+    if last_timestamp is not None:
+      # Continue each symbol's indicators from the state saved by the previous run, one tick at a time
+      indicators = _load_indicator_states(state['price_indicators'], list(positions))
+      values = np.empty((len(btc_data), len(a.INDICATOR_COLUMNS)))
+      for symbol, rows in positions.items():
+        stream = indicators.setdefault(symbol, StreamingIndicators())
+        values[rows] = stream.update_many(btc_data['price'].iloc[rows]).to_numpy()
+      df_with_indicators = btc_data.copy()
+      df_with_indicators[a.INDICATOR_COLUMNS] = values
+    else:
+      df_with_indicators = btc_data
+      df_with_indicators[a.INDICATOR_COLUMNS] = _sharded_indicators(btc_data, symbol_shards)
+      if state is not None:
+        indicators = {
+          symbol: StreamingIndicators.from_history(btc_data['price'].iloc[rows]) for symbol, rows in positions.items()
+        }
+    record['rows_out'] = len(df_with_indicators)
+
+  # Single-candle shapes of each tick's running daily candle: the raw 'close' is the previous
+  # day's close (equal to 'open'), so the current price closes the candle. Consecutive ticks are
+  # snapshots of the same candle, so multi-bar patterns are detected on the daily bars instead.
+  if all(col in btc_data.columns for col in ['open', 'dayHigh', 'dayLow']):
+    with span('detect_patterns', len(df_with_indicators)):
+      df_with_indicators = a.detect_patterns(df_with_indicators, copy=False, close='price', single=True)
 
   # Clean hourly BTC price data
   hr_btc = df_with_indicators
@@ -59,53 +102,61 @@ def preprocess_price_data():
   hr_btc = hr_btc.dropna(subset=['time'])
   hr_btc['time'] = hr_btc['time'].dt.floor('h')
 
-  # Save preprocessed data
-  hr_btc.to_csv('./processed/hourly_btc_tw_data.csv')
-
-  return
-
-def convert2_daily_price():
-  # Load the hourly dataset
-  btc_data = pd.read_csv('./processed/hourly_btc_tw_data.csv')
-
-  # Convert 'time' to datetime
-  btc_data['time'] = pd.to_datetime(btc_data['time'])
-
-  # Resample to daily intervals and calculate required metrics
-  day_btc = btc_data.resample('D', on='time').agg({
-      'price': ['first', 'last', 'mean'],  # Open, Close, and Average Price
-      'volume': 'sum',                     # Total Volume
-      'dayHigh': 'max',                    # Daily High Price
-      'dayLow': 'min',                     # Daily Low Price
-      'SMA_5': 'mean',                     # Average SMA_5
-      'SMA_10': 'mean',                    # Average SMA_10
-      'RSI': 'mean',                       # Average RSI
-      'MACD': 'last',                      # Last MACD Value of the Day
-      'Signal_Line': 'last',               # Last Signal Line of the Day
-      'MACD_Histogram': 'last'             # Last MACD Histogram of the Day
-  }).reset_index()
-
-  # Fix for multi-level columns
-  day_btc.columns = ['_'.join(col).strip() if isinstance(col, tuple) else col for col in day_btc.columns]
-
-  # Reformat column names
-  day_btc = day_btc.rename(columns={
-    'time_': 'time',
-    'price_first': 'open',
-    'price_last': 'close',
-    'price_mean': 'price',
-    'volume_sum': 'volume',
-    'dayHigh_max': 'dayHigh',
-    'dayLow_min': 'dayLow',
-    'SMA_5_mean': 'SMA_5',
-    'SMA_10_mean': 'SMA_10',
-    'RSI_mean': 'RSI',
-    'MACD_last': 'MACD',
-    'Signal_Line_last': 'Signal_Line',
-    'MACD_Histogram_last': 'MACD_Histogram'
+  # Save preprocessed data, appending new rows in incremental mode
+  if last_timestamp is not None:
+    replace_frame_tail(hr_btc, 'hourly_btc_tw_data', 'timestamp', hr_btc.index.min(), index=True)
+  elif persist:
+    save_frame(hr_btc, 'hourly_btc_tw_data', index=True)
+
+  # Advance the high-water mark
+  if state is not None:
+    state['price_timestamp'] = int(btc_data.index.max().timestamp())
+    state['price_indicators'] = {symbol: stream.to_dict() for symbol, stream in indicators.items()}
+
+  return hr_btc
+
+def rollup_price_data(hr_btc=None, since=None, persist=True):
+  # Build the 1h -> 6h -> 1D -> 1W bar pyramid from the hourly frame, or in incremental
+  # mode rebuild only the bars from the one holding `since` and append them
+  with span('rollup_pyramid') as record:
+    if since is not None:
+      rollups = update_pyramid(since)
+    else:
+      if hr_btc is None:
+        hr_btc = load_frame('hourly_btc_tw_data', columns=ROLLUP_SOURCE_COLUMNS)
+      rollups = build_pyramid(hr_btc[ROLLUP_SOURCE_COLUMNS], persist=persist)
+    record['rows_out'] = sum(len(bars) for bars in rollups.values())
+
+  return rollups
+
+def candlestick_frame(level='6h', rollups=None):
+  # Bars of one pyramid level renamed for mplfinance, with moving averages per symbol
+  bars = query(level, pyramid=rollups).set_index(['symbol', 'time'])
+  candles = bars[['open', 'close', 'dayHigh', 'dayLow', 'volume']].rename(columns={
+      'close': 'Close',
+      'dayHigh': 'High',
+      'dayLow': 'Low',
+      'open': 'Open',
+      'volume': 'Volume'
   })
-
-  # Save the daily data to a CSV file
-  day_btc.to_csv('./processed/day_btc_data.csv', index=False)
+  close = candles.groupby(level='symbol', observed=True)['Close']
+  candles['SMA5'] = close.rolling(window=5, min_periods=1).mean().droplevel(0)
+  candles['SMA10'] = close.rolling(window=10, min_periods=1).mean().droplevel(0)
+  return candles
+
+def convert2_daily_price(rollups=None, since=None, persist=True):
+  # Daily bars of the rollup pyramid: open/close, mean price, total volume, daily high/low,
+  # mean SMA and RSI, the MACD values at the close and the candlestick patterns of each day
+  # (only the days from `since` in incremental mode)
+  if since is not None:
+    day_btc = query('1D', start=since, with_patterns=True)
+  else:
+    day_btc = query('1D', pyramid=rollups, with_patterns=True)
+
+  # Save the daily data
+  if since is not None:
+    replace_frame_tail(day_btc, 'day_btc_data', 'time', since)
+  elif persist:
+    save_frame(day_btc, 'day_btc_data')
 
   return day_btc
@@ -1,79 +1,146 @@
 # Import external libraries
-import numpy as np
-import pandas as pd
-import math
-import time
-import datetime
-# import mplfinance as mpf
-from dateutil import parser
 import re
+import pandas as pd
 # Import utility functions
 import util.vader as t
+from util.cache import get_cache
+from util.instrument import span
+from util.ingest import TWITTER_DTYPES, read_chunks, concat_chunks
+from util.storage import save_frame, load_frame, load_frame_tail, replace_frame_tail
+
+# Precompiled link pattern removed from tweet text
+URL_PATTERN = re.compile(r'https?://\S+')
+
+# Tweet filters: minimum engagement per column and required language
+ENGAGEMENT_COLUMNS = ['quotes', 'replies', 'retweets', 'bookmarks', 'favorites']
+MIN_ENGAGEMENT = 10
+LANGUAGE = 'en'
 
 '''
 Twitter Sentimental Analysis
 '''
-def preprocess_twitter_data():
-  # Read raw twitter dataset
-  tw_data = pd.read_csv('data/twitter_data.csv',index_col=0)
-
+def clean_twitter_data(tw_data, min_engagement=MIN_ENGAGEMENT, lang=LANGUAGE):
   # If there is missing values, drop these missing values
   tw_data = tw_data.dropna()
 
-  # Extract link values from the **text** column with regex.
-  tw_data['text'] = tw_data['text'].apply(
-    lambda x: re.sub(r'https?://\S+', '', x).strip()
-    )  
-
-  # Remove all "\n" from the **text** column.
-  tw_data['text'] = tw_data['text'].replace('\n', '', regex=True)
+  # Combine the cheap row predicates into one boolean mask: at least `min_engagement`
+  # quotes, replies, retweets, bookmarks and favorites, and the requested language.
+  mask = (tw_data[ENGAGEMENT_COLUMNS] >= min_engagement).all(axis=1) & (tw_data['lang'] == lang)
+  tw_data = tw_data[mask]
 
-  # Assert if there is any empty strings for the **text** column
-  tw_data = tw_data[tw_data['text'] != '']
+  # Remove links and surrounding whitespace, then every "\n", from the **text** column of the
+  # remaining rows with vectorized string operations.
+  text = tw_data['text'].str.replace(URL_PATTERN, '', regex=True).str.strip().str.replace('\n', '', regex=False)
 
   # Drop every row where **text** column is an empty string
-  tw_data = tw_data.drop(tw_data[tw_data['text'].isna() | (tw_data['text'].str.strip() == '')].index)
+  non_empty = (text.str.strip() != '').to_numpy()
 
-  # Drop rows where column quotes or replies or retweets or bookmarks or favorites is less than 10.
-  tw_data = tw_data.drop(
-    tw_data[
-      (tw_data['quotes'] < 10) | 
-      (tw_data['replies'] < 10) | 
-      (tw_data['retweets'] < 10) | 
-      (tw_data['bookmarks'] < 10) | 
-      (tw_data['favorites'] < 10)
-    ].index
-  )
+  return tw_data[non_empty].assign(text=text[non_empty])
 
-  # Drop rows where column lang is not "en" (Twitter text is not in English)
-  tw_data = tw_data.drop(tw_data[(tw_data['lang'] != 'en')].index)
+def preprocess_twitter_data(n_jobs=None, use_cache=True, state=None, persist=True, chunksize=None,
+                            min_engagement=MIN_ENGAGEMENT, lang=LANGUAGE, flair=False, flair_batch_size=32):
+  # In incremental mode keep only tweets past the high-water mark, then advance it
+  last_time = state.get('twitter_time') if state is not None else None
+  latest_time = None
 
-  # Apply VADER sentiment anaylysis to the twitter dataset.
-  tw_data[['vd_negative', 'vd_neutral', 'vd_positive', 'vd_compound']] = tw_data['text'].apply(
-    lambda x: pd.Series(t.vader_sentiment(x))
-    )
+  # Read raw twitter dataset with explicit dtypes, cleaning and filtering chunk by chunk
+  chunks = []
+  for chunk in read_chunks('data/twitter_data.csv', TWITTER_DTYPES, chunksize):
+    if state is not None:
+      raw_times = pd.to_datetime(chunk['time'], format='mixed')
+      if last_time is not None:
+        chunk = chunk[raw_times > pd.Timestamp(last_time)]
+        raw_times = raw_times[raw_times > pd.Timestamp(last_time)]
+      if not chunk.empty and (latest_time is None or raw_times.max() > latest_time):
+        latest_time = raw_times.max()
+    chunks.append(clean_twitter_data(chunk, min_engagement, lang))
+  tw_data = concat_chunks(chunks)
+  del chunks
 
-  # Convert current cleaned data to csv
-  tw_data.to_csv('./processed/processed_twitter_data.csv', index=False)
+  if state is not None:
+    if latest_time is None:
+      return None
+    state['twitter_time'] = latest_time.isoformat()
 
-  return
+  # Apply VADER sentiment anaylysis to the twitter dataset in parallel chunks,
+  # skipping texts already scored by a previous run. The cache lives in processed/,
+  # so runs that do not persist neither read nor write it.
+  cache = get_cache() if use_cache and persist else None
+  with span('vader_sentiment_batch', len(tw_data)) as record:
+    scores = t.vader_sentiment_batch(tw_data['text'].to_numpy(), n_jobs=n_jobs, cache=cache)
+    record['rows_out'] = len(scores)
+  if cache is not None:
+    cache.report()
+  for i, col in enumerate(t.VADER_COLUMNS):
+    tw_data[col] = scores[:, i]
 
-def convert2_daily_data():
-   # Read processed Twitter dataset
-  tw_data = pd.read_csv('./processed/processed_twitter_data.csv')
+  # Optionally add Flair labels and scores next to the VADER columns; util.text is
+  # imported here so runs without Flair never load the model.
+  if flair:
+    import util.text as fl
+    with span('flair_sentiment_batch', len(tw_data)) as record:
+      labels, fl_scores = fl.flair_sentiment_batch(tw_data['text'].to_numpy(), mini_batch_size=flair_batch_size,
+                                                   cache=cache)
+      record['rows_out'] = len(labels)
+    tw_data['fl_label'] = labels
+    tw_data['fl_score'] = fl_scores
 
-  # Convert **time** column datatype
+  # Store typed times, sorted so incremental runs can read just the tail
   tw_data['time'] = pd.to_datetime(tw_data['time'], format='mixed')
-  tw_data = tw_data.sort_values(by='time')
-
-  # Daily mean
-  v_day_mean = tw_data.groupby(
-    tw_data['time'].dt.floor('d')
-    )[['vd_positive', 'vd_negative', 'vd_neutral', 'vd_compound']].mean().reset_index()
-  
-  # Daily median
-  v_day_med = tw_data.groupby(
-    tw_data['time'].dt.floor('d')
-    )[['vd_positive', 'vd_negative', 'vd_neutral', 'vd_compound']].median().reset_index()
-  
-  return v_day_mean, v_day_med
+  tw_data = tw_data.sort_values(by='time', kind='stable')
+  times = tw_data['time']
+
+  # Save current cleaned data, appending new tweets in incremental mode
+  if last_time is not None:
+    if tw_data.empty:
+      return None
+    replace_frame_tail(tw_data, 'processed_twitter_data', 'time', times.min())
+  elif persist:
+    save_frame(tw_data, 'processed_twitter_data')
+
+  return tw_data
+
+def convert2_daily_data(tw_data=None, since=None):
+  # Use the processed Twitter frame handed over in memory, or load the stored one
+  # (only the days touched by new tweets in incremental mode)
+  columns = ['time'] + t.VADER_COLUMNS + ENGAGEMENT_COLUMNS
+  if since is not None:
+    tw_data = load_frame_tail('processed_twitter_data', 'time', since, columns=columns)
+  elif tw_data is not None:
+    tw_data = tw_data[columns].copy()
+  else:
+    tw_data = load_frame('processed_twitter_data', columns=columns)
+
+  # Day key, computed once; groupby orders the days itself, so the tweets are not sorted
+  day = pd.to_datetime(tw_data['time'], format='mixed').dt.floor('D').rename('time')
+
+  # Engagement-weighted sentiment is sum(weight * score) / sum(weight) per day
+  tw_data['engagement'] = tw_data[ENGAGEMENT_COLUMNS].sum(axis=1)
+  for col in t.VADER_COLUMNS:
+    tw_data[col + '_weighted'] = tw_data[col] * tw_data['engagement']
+
+  with span('daily_sentiment_agg', len(tw_data)) as record:
+    grouped = tw_data.groupby(day)
+
+    # Mean, spread, volume and the weighted sums in one aggregation
+    stats = {}
+    for col in t.VADER_COLUMNS:
+      stats[col + '_mean'] = (col, 'mean')
+      stats[col + '_std'] = (col, 'std')
+      stats[col + '_weighted'] = (col + '_weighted', 'sum')
+    stats['tweet_count'] = ('engagement', 'size')
+    stats['tweet_engagement'] = ('engagement', 'sum')
+    v_day = grouped.agg(**stats)
+
+    # Median and quartiles from the same grouping, sorting each day's scores only once
+    quantiles = grouped[t.VADER_COLUMNS].quantile([0.25, 0.5, 0.75]).unstack()
+    names = {0.25: 'q25', 0.5: 'med', 0.75: 'q75'}
+    quantiles.columns = [f'{col}_{names[q]}' for col, q in quantiles.columns]
+    v_day = v_day.join(quantiles)
+
+    for col in t.VADER_COLUMNS:
+      v_day[col + '_wmean'] = v_day.pop(col + '_weighted') / v_day['tweet_engagement']
+    record['rows_out'] = len(v_day)
+
+  # One row per day on a sorted DatetimeIndex named 'time'
+  return v_day
@@ -1,5 +1,8 @@
 import numpy as np
 import pandas as pd
+# INDICATOR_COLUMNS is re-exported: the indicator columns calculate_technical_indicators adds
+from util.indicators import INDICATOR_COLUMNS
+import util.patterns as patterns
 
 
 def analyze_returns(daily_data):
@@ -27,62 +30,90 @@ def analyze_returns(daily_data):
   return analysis_df
 
 
-def calculate_technical_indicators(df):
-    """Calculate technical indicators for the dataset."""
-    # Create a copy of the dataframe to avoid modifying the original
-    df = df.copy()
+def _by_group(values, keys):
+    """Positionally indexed series of the values, grouped on keys when given."""
+    series = pd.Series(np.asarray(values), index=pd.RangeIndex(len(values)))
+    return series if keys is None else series.groupby(keys, sort=False)
+
+
+def _in_row_order(result):
+    """Values of a (grouped) window result in the original row order."""
+    if result.index.nlevels > 1:
+        result = result.droplevel(0).sort_index()
+    return result.to_numpy()
+
+
+def calculate_technical_indicators(df, copy=True, by=None):
+    """Calculate technical indicators for the dataset.
+
+    With `by` (a column name such as 'symbol'), every window runs within each group in a
+    single vectorized groupby pass, so indicators never bleed across assets.
+    """
+    # Create a copy of the dataframe to avoid modifying the original,
+    # unless the caller owns it and wants to save memory
+    if copy:
+        df = df.copy()
+    keys = None if by is None else df[by].to_numpy()
+    price = _by_group(df['price'], keys)
     
     # Moving averages
-    df['SMA_5'] = df['price'].rolling(window=5, min_periods=1).mean()
-    df['SMA_10'] = df['price'].rolling(window=10, min_periods=1).mean()
+    df['SMA_5'] = _in_row_order(price.rolling(window=5, min_periods=1).mean())
+    df['SMA_10'] = _in_row_order(price.rolling(window=10, min_periods=1).mean())
     
     # Bollinger Bands
-    df['BB_middle'] = df['price'].rolling(window=10, min_periods=1).mean()
-    bb_std = df['price'].rolling(window=10, min_periods=1).std()
+    df['BB_middle'] = df['SMA_10']
+    bb_std = _in_row_order(price.rolling(window=10, min_periods=1).std())
     df['BB_upper'] = df['BB_middle'] + 2 * bb_std
     df['BB_lower'] = df['BB_middle'] - 2 * bb_std
     
     # RSI
-    delta = df['price'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    df['RSI'].fillna(50, inplace=True)  # Fill initial NaN values
+    delta = pd.Series(_in_row_order(price.diff()))
+    gain = _by_group(delta.where(delta > 0, 0), keys).rolling(window=14, min_periods=1).mean()
+    loss = _by_group(-delta.where(delta < 0, 0), keys).rolling(window=14, min_periods=1).mean()
+    rs = pd.Series(_in_row_order(gain)) / pd.Series(_in_row_order(loss))
+    df['RSI'] = (100 - (100 / (1 + rs))).fillna(50).to_numpy()  # Fill initial NaN values
     
     # MACD
-    exp1 = df['price'].ewm(span=12, adjust=False, min_periods=1).mean()
-    exp2 = df['price'].ewm(span=26, adjust=False, min_periods=1).mean()
+    exp1 = _in_row_order(price.ewm(span=12, adjust=False, min_periods=1).mean())
+    exp2 = _in_row_order(price.ewm(span=26, adjust=False, min_periods=1).mean())
     df['MACD'] = exp1 - exp2
-    df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False, min_periods=1).mean()
+    df['Signal_Line'] = _in_row_order(_by_group(df['MACD'], keys).ewm(span=9, adjust=False, min_periods=1).mean())
     df['MACD_Histogram'] = df['MACD'] - df['Signal_Line']
     
     # Volatility
-    df['volatility'] = df['price'].pct_change().rolling(window=10, min_periods=1).std() * 100
+    returns = _in_row_order(price.pct_change())
+    df['volatility'] = _in_row_order(_by_group(returns, keys).rolling(window=10, min_periods=1).std()) * 100
     
     return df
 
 
-def detect_patterns(df):
-    """Detect candlestick patterns."""
-    df = df.copy()
-    
+def detect_patterns(df, copy=True, by=None, close='close', packed=False, single=False):
+    """Detect candlestick patterns, one boolean column per name in util.patterns.PATTERNS.
+
+    `close` names the column holding each candle's close. With `by` (e.g. 'symbol') multi-bar
+    patterns only look back within each group. With `packed`, a single uint16 'patterns' column
+    holds one bit per pattern instead. With `single`, only the single-candle shapes (SINGLE_PATTERNS) are
+    detected, for rows that are not consecutive candles.
+    """
     # Ensure we have required columns
-    required_columns = ['open', 'close', 'dayHigh', 'dayLow']
+    required_columns = ['open', close, 'dayHigh', 'dayLow']
     if not all(col in df.columns for col in required_columns):
         print("Warning: Missing required columns for pattern detection. Skipping pattern detection.")
         return df
-    
-    # Doji pattern
-    body = abs(df['close'] - df['open'])
-    wick = df['dayHigh'] - df['dayLow']
-    df['Doji'] = body <= (wick * 0.1)
-    
-    # Hammer pattern
-    upper_wick = df['dayHigh'] - df[['open', 'close']].max(axis=1)
-    lower_wick = df[['open', 'close']].min(axis=1) - df['dayLow']
-    df['Hammer'] = (lower_wick > (1.5 * body)) & (upper_wick < body)
-    
+
+    # Price columns are read as arrays, so only the new columns are written to the frame
+    if copy:
+        df = df.copy()
+    keys = df[by].astype(str).to_numpy() if by is not None else None
+    matrix = patterns.detect(df['open'], df['dayHigh'], df['dayLow'], df[close], keys=keys, single=single)
+
+    if packed:
+        df['patterns'] = patterns.pack(matrix)
+    else:
+        names = patterns.SINGLE_PATTERNS if single else patterns.PATTERNS
+        for i, name in enumerate(names):
+            df[name] = matrix[:, i]
+
     return df
 
 
@@ -91,4 +122,132 @@ def calculate_correlation(x, y):
     correlation_matrix = np.corrcoef(x, y)
     correlation_coefficient = correlation_matrix[0, 1]
 
-    return correlation_coefficient
\ No newline at end of file
+    return correlation_coefficient
+
+'''
+Lagged and rolling correlations
+'''
+CORRELATION_METHODS = ('pearson', 'spearman')
+
+
+def _as_columns(values, name):
+    """Float (n, k) array and column names of a frame, series or array."""
+    if isinstance(values, pd.Series):
+        values = values.to_frame(values.name if values.name is not None else name)
+    if isinstance(values, pd.DataFrame):
+        return values.to_numpy(dtype=float), [str(col) for col in values.columns]
+    values = np.asarray(values, dtype=float)
+    values = values.reshape(-1, 1) if values.ndim == 1 else values
+    return values, [f'{name}_{i}' for i in range(values.shape[1])]
+
+
+def _prepare(values, method):
+    """Ranks for Spearman, then each column centred and scaled to keep the running sums well conditioned."""
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"Unknown correlation method '{method}', expected one of {CORRELATION_METHODS}")
+    if method == 'spearman':
+        values = pd.DataFrame(values).rank().to_numpy()
+    with np.errstate(invalid='ignore'):
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+    return (values - mean) / np.where(std > 0, std, 1)
+
+
+def _lag_pairs(x, y, lag):
+    """Rows of x paired with the rows of y `lag` steps later (earlier for a negative lag)."""
+    n = len(x)
+    if lag >= 0:
+        return x[:n - lag], y[lag:], lag
+    return x[-lag:], y[:n + lag], 0
+
+
+def _cumulative_moments(x, y):
+    """Running pair count, sums, sums of squares and cross products of every (x column, y column)
+    pair over the rows where both are present, shaped (6, n + 1, F, T) with a leading zero row."""
+    valid = ~np.isnan(x)[:, :, None] & ~np.isnan(y)[:, None, :]
+    xv = np.where(valid, np.nan_to_num(x)[:, :, None], 0.0)
+    yv = np.where(valid, np.nan_to_num(y)[:, None, :], 0.0)
+    moments = np.zeros((6, len(x) + 1) + valid.shape[1:])
+    for i, moment in enumerate([valid, xv, yv, xv * xv, yv * yv, xv * yv]):
+        np.cumsum(moment, axis=0, out=moments[i, 1:])
+    return moments
+
+
+def _correlation(sums, min_periods):
+    """Correlation from (6, ...) window sums; NaN below min_periods pairs or without variance."""
+    n, sx, sy, sxx, syy, sxy = sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = cov / np.sqrt(var_x * var_y)
+    ok = (n >= max(min_periods, 2)) & (var_x > 1e-12 * n) & (var_y > 1e-12 * n)
+    return np.where(ok, np.clip(r, -1, 1), np.nan), n
+
+
+def calculate_correlations(features, targets, lags=(0,), windows=None, method='pearson', min_periods=None):
+    """Correlation of every feature column with every target column at many lags, as a tidy frame.
+
+    A lag of k pairs the feature at row t with the target at row t + k, so a positive lag
+    means the feature leads. Without `windows` there is one row per (feature, target, lag)
+    over the whole sample; with windows (in rows) there is one row per window end as well,
+    stamped with the time of the latest target row in it. Every window comes from the same
+    running sums, so it costs O(n) whatever its length. Spearman correlates ranks taken over
+    the whole sample, which is exact for full-sample lag-0 correlations without missing values;
+    ranks within each window would break the running sums, so it cannot be combined with windows.
+
+    Columns: feature, target, lag, window (0 for the whole sample), time (rolling only),
+    correlation and n, the number of complete pairs.
+    """
+    if windows and method == 'spearman':
+        raise ValueError("Rolling windows need method='pearson'; spearman ranks are taken over the whole sample")
+    index = targets.index if hasattr(targets, 'index') else pd.RangeIndex(len(targets))
+    x, feature_names = _as_columns(features, 'feature')
+    y, target_names = _as_columns(targets, 'target')
+    if len(x) != len(y):
+        raise ValueError(f"features and targets need the same rows, got {len(x)} and {len(y)}")
+    x, y = _prepare(x, method), _prepare(y, method)
+    n_features, n_targets = len(feature_names), len(target_names)
+    # Names are stored as categoricals, since rolling output repeats them on every row
+    feature_codes, target_codes = np.arange(n_features), np.arange(n_targets)
+
+    frames = []
+    for lag in lags:
+        xs, ys, offset = _lag_pairs(x, y, lag)
+        if len(xs) == 0:
+            continue
+        moments = _cumulative_moments(xs, ys)
+
+        if not windows:
+            r, n = _correlation(moments[:, -1], min_periods or 2)
+            frames.append(pd.DataFrame({
+                'feature': pd.Categorical.from_codes(np.repeat(feature_codes, n_targets), feature_names),
+                'target': pd.Categorical.from_codes(np.tile(target_codes, n_features), target_names),
+                'lag': lag,
+                'window': 0,
+                'correlation': r.ravel(),
+                'n': n.ravel().astype(int),
+            }))
+            continue
+
+        for window in windows:
+            if window > len(xs):
+                continue
+            # Sums over each window are differences of the running sums
+            r, n = _correlation(moments[:, window:] - moments[:, :-window], min_periods or window)
+            ends = index[offset + window - 1:offset + len(xs)]
+            frames.append(pd.DataFrame({
+                'time': np.repeat(ends, n_features * n_targets),
+                'feature': pd.Categorical.from_codes(
+                    np.tile(np.repeat(feature_codes, n_targets), len(ends)), feature_names),
+                'target': pd.Categorical.from_codes(np.tile(target_codes, len(ends) * n_features), target_names),
+                'lag': lag,
+                'window': window,
+                'correlation': r.ravel(),
+                'n': n.ravel().astype(int),
+            }))
+
+    columns = ['feature', 'target', 'lag', 'window'] + (['time'] if windows else []) + ['correlation', 'n']
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
@@ -0,0 +1,179 @@
+# Import external libraries
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+
+# Parameter grid swept by the command line: 4 * 3 * 10 * 21 * 2 = 5040 strategies
+SWEEP_GRID = {
+  'fee': [0.0, 0.0005, 0.001, 0.002],
+  'slippage': [0.0, 0.0005, 0.001],
+  'size': np.round(np.linspace(0.1, 1.0, 10), 2).tolist(),
+  'threshold': np.round(np.linspace(0.5, 0.7, 21), 2).tolist(),
+  'allow_short': [False, True],
+}
+
+# Values held in memory per block of strategies (strategies * bars)
+BLOCK_ELEMENTS = 1 << 24
+
+METRICS = ['pnl', 'sharpe', 'max_drawdown', 'turnover', 'exposure']
+
+
+def periods_per_year(times):
+  """Bars per year of a time index, from its median spacing; crypto trades every day of the year."""
+  steps = np.diff(np.unique(np.asarray(times, dtype='datetime64[ns]')))
+  if len(steps) == 0:
+    return 365.0
+  return pd.Timedelta('365D') / pd.Timedelta(np.median(steps))
+
+
+def _as_matrix(values):
+  values = np.asarray(values, dtype=float)
+  return values.reshape(-1, 1) if values.ndim == 1 else values
+
+
+def _unit_legs(returns, proba, threshold, allow_short):
+  """Per-bar gross return and traded notional of full-size positions, one row per (threshold, short) rule.
+
+  Size, fees and slippage only scale these, so the (rules, bars, assets) work is done once per rule
+  rather than once per strategy.
+  """
+  col = (slice(None), None, None)
+
+  # Position held over each bar: long above the threshold, short below 1 - threshold when allowed,
+  # with the capital split equally between the assets
+  long = proba[None] > threshold[col]
+  short = (proba[None] < 1 - threshold[col]) & allow_short[col]
+  position = (long.astype(float) - short) / proba.shape[1]
+
+  # Every change of position, including the final exit, is traded
+  padded = np.concatenate([np.zeros_like(position[:, :1]), position, np.zeros_like(position[:, :1])], axis=1)
+  traded = np.abs(np.diff(padded, axis=1)).sum(axis=2)
+  traded[:, -2] += traded[:, -1]
+
+  return (position * returns[None]).sum(axis=2), traded[:, :-1], np.abs(position).sum(axis=2).mean(axis=1)
+
+
+def _simulate(gross, traded, exposure, cost, size, ppy):
+  """Metrics of a block of k strategies from the unit legs of their rules, all (k, bars) or (k,)."""
+  net = size[:, None] * (gross - traded * cost[:, None])
+  equity = np.cumprod(1 + net, axis=1)
+  peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1)
+
+  std = net.std(axis=1, ddof=1) if net.shape[1] > 1 else np.full(len(net), np.nan)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    sharpe = np.where(std > 0, net.mean(axis=1) / std * np.sqrt(ppy), np.nan)
+
+  return np.column_stack([
+    equity[:, -1] - 1,
+    sharpe,
+    np.minimum((equity / peak - 1).min(axis=1), 0),
+    size * traded.sum(axis=1),
+    size * exposure,
+  ])
+
+
+def backtest(prices, proba, fee=0.001, slippage=0.0005, size=1.0, threshold=0.5, allow_short=False,
+             periods=365.0):
+  """Simulate one or many strategies on the same bars at once.
+
+  prices and proba are (n,) arrays, or (n, m) for m assets, with proba the predicted chance
+  that each bar's price is higher at the next bar. The position taken on bar t earns the
+  return from t to t + 1; NaN prices or probabilities leave the asset flat. The strategy
+  parameters broadcast against each other, one strategy per element, and the result is
+  one row of metrics per strategy: pnl (total return), annualised sharpe, max_drawdown,
+  turnover (traded notional over capital) and exposure (mean gross position).
+  """
+  prices, proba = _as_matrix(prices), _as_matrix(proba)
+  if prices.shape != proba.shape:
+    raise ValueError(f"prices {prices.shape} and proba {proba.shape} must have the same shape")
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    returns = prices[1:] / prices[:-1] - 1
+  returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+  proba = proba[:-1]
+
+  params = np.broadcast_arrays(*[np.asarray(p) for p in (fee, slippage, size, threshold, allow_short)])
+  fee, slippage, size, threshold = (p.astype(float).ravel() for p in params[:4])
+  allow_short = params[4].astype(bool).ravel()
+
+  # Positions depend only on the threshold and shorting rule; simulate each distinct rule once
+  rules, rule_of = np.unique(np.column_stack([threshold, allow_short]), axis=0, return_inverse=True)
+  rule_of = rule_of.ravel()
+  gross, traded, exposure = _unit_legs(returns, proba, rules[:, 0], rules[:, 1].astype(bool))
+
+  # Strategies are evaluated in blocks so the (strategies, bars) arrays stay bounded
+  block = max(1, BLOCK_ELEMENTS // max(1, len(returns)))
+  metrics = np.empty((len(fee), len(METRICS)))
+  for start in range(0, len(fee), block):
+    rows = slice(start, start + block)
+    rule = rule_of[rows]
+    metrics[rows] = _simulate(gross[rule], traded[rule], exposure[rule], fee[rows] + slippage[rows],
+                              size[rows], periods)
+
+  result = pd.DataFrame({'fee': fee, 'slippage': slippage, 'size': size, 'threshold': threshold,
+                         'allow_short': allow_short})
+  result[METRICS] = metrics
+  return result
+
+
+def sweep(prices, proba, grid=SWEEP_GRID, periods=365.0):
+  """Backtest every combination of the grid's parameter lists in one batched computation."""
+  names = list(grid)
+  combos = list(itertools.product(*(grid[name] for name in names)))
+  params = {name: np.array([combo[i] for combo in combos]) for i, name in enumerate(names)}
+  return backtest(prices, proba, periods=periods, **params)
+
+
+def model_signals(df, predictor):
+  """Wide (time x symbol) fill price and up-probability frames of the model rows with complete features.
+
+  Positions are filled at each bar's close: the 'close' column of daily rows, whose 'price' is
+  the day's mean and would credit the move from the mean to the close, already known when the
+  signal is computed; feature-store bars have no 'close', as their 'price' is the bar close.
+  """
+  rows = df.dropna(subset=predictor.features)
+  fill = rows['close'] if 'close' in rows.columns else rows['price']
+  proba = pd.Series(predictor.predict_proba(rows), index=rows.index)
+  frame = pd.DataFrame({'symbol': rows['symbol'].astype(str), 'price': fill, 'proba': proba})
+  frame = frame.reset_index()
+  prices = frame.pivot(index='time', columns='symbol', values='price')
+  return prices, frame.pivot(index='time', columns='symbol', values='proba')
+
+
+if __name__ == '__main__':
+  # Import module functions
+  import util.storage as storage
+  from model_train import load_model_frame, model_rows, technical_features, price_features
+  from util.serving import Predictor
+  from util.train import split_data
+
+  cli = argparse.ArgumentParser(description="Backtest the saved model's up/down signals over a grid of strategies")
+  cli.add_argument('--model', default=None, help='artifact path (default: latest in ./models)')
+  cli.add_argument('--resolution', default=None,
+                   help="bar size to trade (default: the model's own, daily merged rows if it has none)")
+  cli.add_argument('--all-rows', action='store_true',
+                   help='trade every bar, not only the test rows held out from training')
+  cli.add_argument('--storage', choices=['parquet', 'arrow', 'csv'], default=storage.STORAGE_FORMAT,
+                   help='file format of the processed/ intermediates')
+  cli.add_argument('--top', type=int, default=10, help='strategies to list, best Sharpe first')
+  cli.add_argument('--output', default=None, help='also write every strategy to this CSV file')
+  args = cli.parse_args()
+  storage.set_format(args.storage)
+
+  predictor = Predictor(args.model)
+  resolution = args.resolution or predictor.metadata.get('resolution')
+  df, sentiment = load_model_frame(resolution=resolution)
+
+  # By default only the test rows of the training split are traded, so the backtest is out of sample
+  if not args.all_rows:
+    df, _ = model_rows(df, sentiment)
+    X_train, _, _, _ = split_data(df, technical_features, sentiment, price_features)
+    df = df.iloc[len(X_train):]
+  prices, proba = model_signals(df, predictor)
+
+  results = sweep(prices.to_numpy(), proba.to_numpy(), periods=periods_per_year(prices.index))
+  print(f"{len(results)} strategies over {len(prices)} bars of {', '.join(prices.columns)}")
+  print(results.sort_values('sharpe', ascending=False).head(args.top).to_string(index=False))
+  if args.output:
+    results.to_csv(args.output, index=False)
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+# Default on-disk location and size bound of the shared sentiment cache
+CACHE_PATH = './processed/sentiment_cache.sqlite'
+MAX_ENTRIES = 2000000
+
+# SQLite caps the number of bound parameters per statement
+_BATCH = 900
+
+_default_cache = None
+
+
+class SentimentCache:
+  """Persistent sentiment score cache keyed by text hash and analyzer version, with LRU eviction."""
+
+  def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+    self.path = path
+    self.max_entries = max_entries
+    self.hits = 0
+    self.misses = 0
+
+    if os.path.dirname(path):
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+    self.conn = sqlite3.connect(path)
+    self.conn.execute(
+      'CREATE TABLE IF NOT EXISTS scores (key BLOB PRIMARY KEY, value TEXT, last_used INTEGER)'
+    )
+    self.conn.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+    self.conn.commit()
+
+  @staticmethod
+  def key(version, text):
+    """Hash a cleaned text together with the analyzer/lexicon version."""
+    return hashlib.sha1(f'{version}\x00{text}'.encode('utf-8')).digest()
+
+  def get_many(self, version, texts):
+    """Return a dict of text -> cached scores for every text already in the cache."""
+    keys = {self.key(version, text): text for text in texts}
+    found = {}
+    key_list = list(keys)
+
+    for i in range(0, len(key_list), _BATCH):
+      batch = key_list[i:i + _BATCH]
+      rows = self.conn.execute(
+        f'SELECT key, value FROM scores WHERE key IN ({",".join("?" * len(batch))})', batch
+      ).fetchall()
+      for key, value in rows:
+        found[keys[key]] = tuple(json.loads(value))
+
+      # Touch hits so they move to the young end of the LRU order
+      now = time.time_ns()
+      self.conn.executemany('UPDATE scores SET last_used = ? WHERE key = ?', [(now, key) for key, _ in rows])
+
+    self.conn.commit()
+    self.hits += len(found)
+    self.misses += len(keys) - len(found)
+
+    return found
+
+  def put_many(self, version, scores):
+    """Store a dict of text -> scores and evict the least recently used entries past the size bound."""
+    now = time.time_ns()
+    self.conn.executemany(
+      'INSERT OR REPLACE INTO scores (key, value, last_used) VALUES (?, ?, ?)',
+      [(self.key(version, text), json.dumps(list(value)), now) for text, value in scores.items()]
+    )
+    self.evict()
+    self.conn.commit()
+
+  def evict(self):
+    """Drop the least recently used entries above max_entries."""
+    count = self.conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+    if count > self.max_entries:
+      self.conn.execute(
+        'DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)',
+        (count - self.max_entries,)
+      )
+
+  def stats(self):
+    """Return hit/miss counts for this session."""
+    total = self.hits + self.misses
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': self.hits / total if total else 0.0,
+    }
+
+  def report(self):
+    """Print hit/miss counts for this session."""
+    stats = self.stats()
+    print(f"Sentiment cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
+
+  def close(self):
+    self.conn.close()
+
+
+def get_cache():
+  """Return the process-wide shared sentiment cache."""
+  global _default_cache
+  if _default_cache is None:
+    _default_cache = SentimentCache()
+  return _default_cache
@@ -0,0 +1,188 @@
+# Import external libraries
+import numpy as np
+
+'''
+Compiled forest inference
+The fitted trees of a RandomForestClassifier are flattened into one set of contiguous node
+arrays, with the StandardScaler folded into the thresholds, and every tree is walked over a
+block of rows at once with array operations. Predictions equal the scaler + forest pipeline's.
+'''
+# Rows traversed together; bounds the (rows, trees) node index arrays
+BLOCK_SIZE = 4096
+
+# Traversal steps between drops of the (row, tree) pairs that reached a leaf
+COMPACT_EVERY = 4
+
+
+def _ordered(values):
+  """Map float64 values to int64 keys with the same order, so floats can be bisected as integers."""
+  bits = values.view(np.int64)
+  return np.where(bits < 0, np.int64(-2**63) - bits - 1, bits)
+
+
+def _from_ordered(keys):
+  bits = np.where(keys < 0, np.int64(-2**63) - keys - 1, keys)
+  return bits.view(np.float64)
+
+
+def _fold_thresholds(threshold, mean, scale):
+  """Largest raw value x with float32((x - mean) / scale) <= threshold, for every split.
+
+  The trees compare the scaled features after casting them to float32. That map is monotone
+  in x, so each split is the half-line x <= t, and bisecting on the float64 values finds
+  the exact t: a raw value goes left exactly when its scaled value went left.
+  """
+  def goes_left(x):
+    return np.float32((x - mean) / scale).astype(np.float64) <= threshold
+
+  estimate = threshold * scale + mean
+  step = (np.abs(threshold) + 1) * scale * 1e-6
+  lo, hi = estimate - step, estimate + step
+  # Widen the bracket until lo goes left and hi goes right
+  while True:
+    grow_lo, grow_hi = ~goes_left(lo), goes_left(hi)
+    if not grow_lo.any() and not grow_hi.any():
+      break
+    step = step * 2
+    lo = np.where(grow_lo, lo - step, lo)
+    hi = np.where(grow_hi, hi + step, hi)
+
+  # Bisect on the ordered integer keys down to adjacent floats
+  lo_key, hi_key = _ordered(lo), _ordered(hi)
+  while True:
+    open_ = hi_key - lo_key > 1
+    if not open_.any():
+      return _from_ordered(lo_key)
+    mid_key = lo_key + (hi_key - lo_key) // 2
+    left = goes_left(_from_ordered(mid_key))
+    lo_key = np.where(open_ & left, mid_key, lo_key)
+    hi_key = np.where(open_ & ~left, mid_key, hi_key)
+
+
+class CompiledForest:
+  """Array form of a fitted RandomForestClassifier, optionally fused with the StandardScaler it was fit behind.
+
+  Node i of the flattened forest splits on feature[i] at threshold[i] (a raw, unscaled value),
+  sends missing values left where missing_left[i], and has children left[i] and right[i];
+  leaves point at themselves and value[i] holds their class probabilities.
+  """
+
+  def __init__(self, model, scaler=None):
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    n_features = model.n_features_in_
+    self.classes_ = model.classes_
+    self.n_features = n_features
+    self.n_trees = len(trees)
+
+    # One node array per field, trees back to back; roots holds each tree's first node
+    sizes = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    self.roots = offsets.astype(np.int64)
+
+    feature = np.concatenate([tree.feature for tree in trees]).astype(np.int64)
+    threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+    left = np.concatenate([tree.children_left + offset for tree, offset in zip(trees, offsets)]).astype(np.int64)
+    right = np.concatenate([tree.children_right + offset for tree, offset in zip(trees, offsets)]).astype(np.int64)
+    missing_left = np.concatenate([
+      getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)) for tree in trees
+    ]).astype(bool)
+    # Class probabilities of every node, as the trees predict them
+    self.value = np.concatenate([tree.value[:, 0, :len(model.classes_)] for tree in trees]).astype(np.float64)
+
+    # Leaves point at themselves, so rows that reached one can keep stepping until they are dropped
+    leaf = np.concatenate([tree.children_left == -1 for tree in trees])
+    nodes = np.arange(len(feature))
+    feature[leaf] = 0
+    threshold[leaf] = np.inf
+    left[leaf] = nodes[leaf]
+    right[leaf] = nodes[leaf]
+    self.max_depth = max(tree.max_depth for tree in trees)
+
+    # Fold the scaler into the split thresholds: raw x <= t exactly when (x - mean) / scale went left.
+    # Without a scaler the trees still compare float32 features, so the thresholds are folded all the
+    # same; infinite ones (splits sending only missing values right) mean the same on either side
+    mean, scale = np.zeros(n_features), np.ones(n_features)
+    if scaler is not None:
+      if getattr(scaler, 'mean_', None) is not None:
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+      if getattr(scaler, 'scale_', None) is not None:
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+    split = ~leaf & np.isfinite(threshold)
+    threshold[split] = _fold_thresholds(threshold[split], mean[feature[split]], scale[feature[split]])
+
+    self.feature, self.threshold = feature, threshold
+    self.left, self.right, self.missing_left = left, right, missing_left
+    self._layout()
+
+  def _layout(self):
+    """Traversal arrays indexed by slot 2 * node + went_left, so one lookup finds the next node's slot."""
+    self._children = np.column_stack([2 * self.right, 2 * self.left]).ravel()
+    self._feature = np.repeat(self.feature, 2)
+    self._threshold = np.repeat(self.threshold, 2)
+    self._missing_left = np.repeat(self.missing_left, 2)
+    self._leaf = np.repeat(self.left == np.arange(len(self.left)), 2)
+
+  def apply(self, X):
+    """Leaf node of every tree for each row, as an (n_rows, n_trees) array of global node indices.
+
+    All (row, tree) pairs step down one level at a time together; every COMPACT_EVERY steps the
+    pairs that reached a leaf are set aside, so the arrays shrink as the shallower paths finish.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != self.n_features:
+      raise ValueError(f"Expected {self.n_features} features, got {X.shape[-1]}")
+
+    flat = X.ravel()
+    has_missing = np.isnan(flat).any()
+    slot = np.tile(2 * self.roots, len(X))
+    offset = np.repeat(np.arange(len(X)) * self.n_features, self.n_trees)
+    position = np.arange(len(slot))
+    leaves = np.empty(len(slot), dtype=np.int64)
+
+    for step in range(self.max_depth):
+      # Indices are in range by construction, so take can skip its bounds checks
+      x = np.take(flat, offset + np.take(self._feature, slot, mode='clip'), mode='clip')
+      went_left = x <= np.take(self._threshold, slot, mode='clip')
+      if has_missing:
+        went_left |= np.isnan(x) & np.take(self._missing_left, slot, mode='clip')
+      slot = np.take(self._children, slot + went_left, mode='clip')
+
+      if step % COMPACT_EVERY == COMPACT_EVERY - 1 or step == self.max_depth - 1:
+        done = np.take(self._leaf, slot, mode='clip')
+        leaves[position[done]] = slot[done]
+        slot, offset, position = slot[~done], offset[~done], position[~done]
+        if not len(slot):
+          break
+
+    # Only single-leaf trees (max_depth 0) are left over
+    leaves[position] = slot
+    return (leaves // 2).reshape(len(X), self.n_trees)
+
+  def predict_proba(self, X, block_size=BLOCK_SIZE):
+    """Mean class probabilities of the trees, summed in tree order like the forest does."""
+    X = np.asarray(X, dtype=np.float64)
+    proba = np.empty((len(X), len(self.classes_)))
+    for start in range(0, len(X), block_size):
+      leaves = self.apply(X[start:start + block_size])
+      proba[start:start + block_size] = np.cumsum(self.value[leaves], axis=1)[:, -1] / self.n_trees
+    return proba
+
+  def predict(self, X, block_size=BLOCK_SIZE):
+    return self.classes_.take(np.argmax(self.predict_proba(X, block_size), axis=1))
+
+  def save(self, path):
+    """Write the node arrays to one .npz file, readable without scikit-learn."""
+    np.savez(path, classes=self.classes_, roots=self.roots, feature=self.feature, threshold=self.threshold,
+             left=self.left, right=self.right, missing_left=self.missing_left, value=self.value,
+             shape=np.array([self.n_features, self.n_trees, self.max_depth]))
+
+  @classmethod
+  def load(cls, path):
+    arrays = np.load(path)
+    forest = cls.__new__(cls)
+    forest.classes_ = arrays['classes']
+    forest.n_features, forest.n_trees, forest.max_depth = (int(v) for v in arrays['shape'])
+    for name in ['roots', 'feature', 'threshold', 'left', 'right', 'missing_left', 'value']:
+      setattr(forest, name, arrays[name])
+    forest._layout()
+    return forest
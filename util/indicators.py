@@ -0,0 +1,187 @@
+import math
+from collections import deque
+import pandas as pd
+
+# Output columns, in the order produced by util.analysis.calculate_technical_indicators
+INDICATOR_COLUMNS = [
+  'SMA_5', 'SMA_10', 'BB_middle', 'BB_upper', 'BB_lower',
+  'RSI', 'MACD', 'Signal_Line', 'MACD_Histogram', 'volatility',
+]
+
+
+def _alpha(span):
+  """Smoothing factor computed the same way as pandas ewm(span=...)."""
+  return 1. / (1. + (span - 1) / 2.)
+
+
+def _ewm_step(value, x, alpha):
+  """One ewm(adjust=False) update, mirroring the pandas recurrence."""
+  if value is None or math.isnan(value):
+    return x
+  if value != x:
+    value = ((1. - alpha) * value + alpha * x) / ((1. - alpha) + alpha)
+  return value
+
+
+def _std(values):
+  """Sample standard deviation (ddof=1) of the non-NaN values in a small window."""
+  values = [v for v in values if not math.isnan(v)]
+  if len(values) < 2:
+    return math.nan
+  mean = sum(values) / len(values)
+  return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+class RunningWindow:
+  """Fixed-size ring buffer with a running sum, refreshed once per wrap to stop drift."""
+
+  def __init__(self, size, values=(), total=0.0, ticks=0):
+    self.size = size
+    self.values = deque(values, maxlen=size)
+    self.total = total
+    self.ticks = ticks
+
+  def push(self, x):
+    if len(self.values) == self.size:
+      self.total -= self.values[0]
+    self.values.append(x)
+    self.total += x
+
+    # Recompute the sum from the buffer every `size` ticks (amortised O(1))
+    self.ticks += 1
+    if self.ticks % self.size == 0:
+      self.total = math.fsum(self.values)
+
+  def mean(self):
+    return self.total / len(self.values)
+
+  def to_dict(self):
+    return {'size': self.size, 'values': list(self.values), 'total': self.total, 'ticks': self.ticks}
+
+  @classmethod
+  def from_dict(cls, data):
+    return cls(data['size'], data['values'], data['total'], data['ticks'])
+
+
+class StreamingIndicators:
+  """Stateful technical indicators updated in constant time per price tick."""
+
+  def __init__(self):
+    self.sma_5 = RunningWindow(5)
+    self.sma_10 = RunningWindow(10)
+    self.gains = RunningWindow(14)
+    self.losses = RunningWindow(14)
+    self.returns = deque(maxlen=10)
+    self.last_price = None
+    self.ema_12 = None
+    self.ema_26 = None
+    self.signal = None
+
+  def update(self, price):
+    """Consume one price and return the indicator values for it."""
+    price = float(price)
+
+    # Moving averages and Bollinger Bands
+    self.sma_5.push(price)
+    self.sma_10.push(price)
+    sma_10 = self.sma_10.mean()
+    bb_std = _std(self.sma_10.values)
+
+    # RSI; the first delta is NaN and counts as a zero gain and loss
+    delta = math.nan if self.last_price is None else price - self.last_price
+    self.gains.push(delta if delta > 0 else 0.)
+    self.losses.push(-delta if delta < 0 else 0.)
+    gain, loss = self.gains.mean(), self.losses.mean()
+    if loss == 0:
+      rsi = 50. if gain == 0 else 100.
+    else:
+      rsi = 100 - (100 / (1 + gain / loss))
+
+    # MACD
+    self.ema_12 = _ewm_step(self.ema_12, price, _alpha(12))
+    self.ema_26 = _ewm_step(self.ema_26, price, _alpha(26))
+    macd = self.ema_12 - self.ema_26
+    self.signal = _ewm_step(self.signal, macd, _alpha(9))
+
+    # Volatility of percentage changes
+    self.returns.append(math.nan if self.last_price is None else price / self.last_price - 1)
+    self.last_price = price
+
+    return {
+      'SMA_5': self.sma_5.mean(),
+      'SMA_10': sma_10,
+      'BB_middle': sma_10,
+      'BB_upper': sma_10 + 2 * bb_std,
+      'BB_lower': sma_10 - 2 * bb_std,
+      'RSI': rsi,
+      'MACD': macd,
+      'Signal_Line': self.signal,
+      'MACD_Histogram': macd - self.signal,
+      'volatility': _std(self.returns) * 100,
+    }
+
+  def update_many(self, prices):
+    """Consume a sequence of prices and return their indicators as a DataFrame."""
+    index = prices.index if isinstance(prices, pd.Series) else None
+    rows = [self.update(price) for price in prices]
+    return pd.DataFrame(rows, columns=INDICATOR_COLUMNS, index=index)
+
+  def to_dict(self):
+    """Serialize the indicator state to plain JSON-compatible values."""
+    return {
+      'sma_5': self.sma_5.to_dict(),
+      'sma_10': self.sma_10.to_dict(),
+      'gains': self.gains.to_dict(),
+      'losses': self.losses.to_dict(),
+      'returns': list(self.returns),
+      'last_price': self.last_price,
+      'ema_12': self.ema_12,
+      'ema_26': self.ema_26,
+      'signal': self.signal,
+    }
+
+  @classmethod
+  def from_dict(cls, data):
+    """Restore indicator state saved with to_dict."""
+    state = cls()
+    state.sma_5 = RunningWindow.from_dict(data['sma_5'])
+    state.sma_10 = RunningWindow.from_dict(data['sma_10'])
+    state.gains = RunningWindow.from_dict(data['gains'])
+    state.losses = RunningWindow.from_dict(data['losses'])
+    state.returns = deque(data['returns'], maxlen=10)
+    state.last_price = data['last_price']
+    state.ema_12 = data['ema_12']
+    state.ema_26 = data['ema_26']
+    state.signal = data['signal']
+    return state
+
+  @classmethod
+  def from_history(cls, prices):
+    """Build the state reached after a full price history without looping over every tick."""
+    prices = pd.Series(prices, dtype=float).reset_index(drop=True)
+    state = cls()
+    if prices.empty:
+      return state
+
+    # Window state only needs the trailing prices
+    tail = prices.iloc[-15:]
+    deltas = prices.diff().iloc[-14:]
+    returns = prices.pct_change().iloc[-10:]
+    state.sma_5 = RunningWindow(5, tail.iloc[-5:], math.fsum(tail.iloc[-5:]))
+    state.sma_10 = RunningWindow(10, tail.iloc[-10:], math.fsum(tail.iloc[-10:]))
+    gains = deltas.where(deltas > 0, 0).tolist()
+    losses = (-deltas.where(deltas < 0, 0)).tolist()
+    state.gains = RunningWindow(14, gains, math.fsum(gains))
+    state.losses = RunningWindow(14, losses, math.fsum(losses))
+    state.returns = deque(returns.tolist(), maxlen=10)
+    state.last_price = float(prices.iloc[-1])
+
+    # EMA state is the last value of the vectorised recurrences
+    ema_12 = prices.ewm(span=12, adjust=False, min_periods=1).mean()
+    ema_26 = prices.ewm(span=26, adjust=False, min_periods=1).mean()
+    signal = (ema_12 - ema_26).ewm(span=9, adjust=False, min_periods=1).mean()
+    state.ema_12 = float(ema_12.iloc[-1])
+    state.ema_26 = float(ema_26.iloc[-1])
+    state.signal = float(signal.iloc[-1])
+
+    return state
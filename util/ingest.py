@@ -0,0 +1,56 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Rows read per chunk in streaming mode
+CHUNK_SIZE = 100000
+
+# Explicit dtypes for the raw files: categoricals for repeated labels, float32
+# where values are small counts; prices and volumes stay float64
+PRICE_DTYPES = {
+  'symbol': 'category',
+  'name': 'category',
+  'price': 'float64',
+  'dayHigh': 'float64',
+  'dayLow': 'float64',
+  'volume': 'float64',
+  'open': 'float64',
+  'close': 'float64',
+}
+
+TWITTER_DTYPES = {
+  'lang': 'category',
+  'quotes': 'float32',
+  'replies': 'float32',
+  'retweets': 'float32',
+  'bookmarks': 'float32',
+  'favorites': 'float32',
+}
+
+
+def read_chunks(path, dtype, chunksize=CHUNK_SIZE, index_col=0):
+  """Yield a raw CSV as typed frames of at most chunksize rows; chunksize=None yields the whole file."""
+  if chunksize is None:
+    yield pd.read_csv(path, index_col=index_col, dtype=dtype)
+    return
+
+  with pd.read_csv(path, index_col=index_col, dtype=dtype, chunksize=chunksize) as reader:
+    for chunk in reader:
+      yield chunk
+
+
+def concat_chunks(chunks):
+  """Concatenate processed chunks, keeping categorical columns categorical."""
+  chunks = [chunk for chunk in chunks if chunk is not None]
+  if not chunks:
+    return None
+  if len(chunks) == 1:
+    return chunks[0]
+
+  # Align categories across chunks so concat does not fall back to object columns
+  categoricals = [col for col, dtype in chunks[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+  for col in categoricals:
+    categories = union_categoricals([chunk[col] for chunk in chunks]).categories
+    for chunk in chunks:
+      chunk[col] = chunk[col].cat.set_categories(categories)
+
+  return pd.concat(chunks)
@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from util.memory import rss_mb, peak_rss_mb
+
+# JSON-lines file receiving one record per finished span; None disables the output
+TRACE_PATH = os.environ.get('PIPELINE_TRACE')
+
+# Directory receiving one cProfile dump per stage; None disables profiling
+PROFILE_DIR = os.environ.get('PIPELINE_PROFILE_DIR')
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def configure(trace_path=None, profile_dir=None):
+  """Select where span records and per-stage profiles go; pipeline worker processes are configured alike."""
+  global TRACE_PATH, PROFILE_DIR
+  TRACE_PATH = trace_path
+  PROFILE_DIR = profile_dir
+  if profile_dir is not None:
+    os.makedirs(profile_dir, exist_ok=True)
+
+
+def count_rows(value):
+  """Rows of a frame, series or array, summed over tuples, lists and dicts of them; None for anything else."""
+  if isinstance(value, dict):
+    value = list(value.values())
+  if isinstance(value, (tuple, list)):
+    counts = [count_rows(v) for v in value]
+    counts = [c for c in counts if c is not None]
+    return sum(counts) if counts else None
+  if hasattr(value, 'shape') and len(value.shape) > 0:
+    return int(value.shape[0])
+  return None
+
+
+def _emit(record):
+  if TRACE_PATH is None:
+    return
+  line = json.dumps(record, default=str) + '\n'
+  # One append per line keeps records from threads and worker processes whole
+  with _lock, open(TRACE_PATH, 'a') as f:
+    f.write(line)
+
+
+@contextmanager
+def span(name, rows_in=None, profile=False):
+  """Record wall time, CPU time, memory and rows in/out of the enclosed block as one JSON line.
+
+  The yielded dict can be given 'rows_out' (and any other field) before the block ends.
+  Peak RSS is the process high-water mark, which track_peak_memory resets per stage, so
+  for a nested span it is the peak of its stage up to that point; stage records carry
+  peak_rss_shared when other stages ran alongside and the peak is theirs too. CPU time is
+  per process and includes other threads running at the same time.
+  """
+  stack = _local.__dict__.setdefault('stack', [])
+  record = {'span': name, 'parent': stack[-1] if stack else None, 'pid': os.getpid(), 'rows_in': rows_in}
+  stack.append(name)
+
+  profiler = None
+  if profile and PROFILE_DIR is not None:
+    profiler = cProfile.Profile()
+
+  start_rss = rss_mb()
+  start_wall, start_cpu = time.perf_counter(), time.process_time()
+  if profiler is not None:
+    profiler.enable()
+  try:
+    yield record
+    record['status'] = 'ok'
+  except BaseException as e:
+    record['status'] = f'error: {type(e).__name__}'
+    raise
+  finally:
+    if profiler is not None:
+      profiler.disable()
+    record['wall_s'] = time.perf_counter() - start_wall
+    record['cpu_s'] = time.process_time() - start_cpu
+    record['peak_rss_mb'] = peak_rss_mb()
+    end_rss = rss_mb()
+    record['rss_delta_mb'] = end_rss - start_rss if end_rss is not None and start_rss is not None else None
+    record.setdefault('rows_out', None)
+    record['time'] = time.time()
+    stack.pop()
+
+    if profiler is not None:
+      profiler.dump_stats(os.path.join(PROFILE_DIR, f'{name}.{os.getpid()}.prof'))
+    _emit(record)
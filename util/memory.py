@@ -0,0 +1,75 @@
+import sys
+import resource
+import threading
+from contextlib import contextmanager
+
+# Stats of the track_peak_memory blocks currently running in this process
+_active = []
+_active_lock = threading.Lock()
+
+
+def reset_peak_rss():
+  """Reset the kernel's peak-RSS counter for this process where supported (Linux)."""
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+    return True
+  except OSError:
+    return False
+
+
+def _status_mb(field):
+  """Read a kB field of /proc/self/status in MB, or None off Linux."""
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith(field + ':'):
+          return int(line.split()[1]) / 1024
+  except OSError:
+    pass
+  return None
+
+
+def rss_mb():
+  """Current resident set size of this process in MB, or None where unavailable."""
+  return _status_mb('VmRSS')
+
+
+def peak_rss_mb():
+  """Peak resident set size of this process in MB since start or the last reset."""
+  peak = _status_mb('VmHWM')
+  if peak is not None:
+    return peak
+
+  # ru_maxrss is in kB on Linux and in bytes on macOS, and cannot be reset
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def track_peak_memory(label=None):
+  """Measure the peak RSS of the enclosed block; pool worker processes are not included.
+
+  The peak counter is process-wide, so it is only reset when no other tracked block is
+  running. Blocks that overlap (stages running in threads) are marked 'shared': their
+  peak is that of the process while they ran, not their own.
+  """
+  with _active_lock:
+    stats = {'shared': bool(_active), 'start_rss_mb': rss_mb()}
+    stats['resettable'] = not _active and reset_peak_rss()
+    for other in _active:
+      other['shared'] = True
+    _active.append(stats)
+  try:
+    yield stats
+  finally:
+    with _active_lock:
+      _active.remove(stats)
+    stats['peak_rss_mb'] = peak_rss_mb()
+    if label is not None:
+      growth = ''
+      if stats['shared']:
+        growth = ' (shared with stages running alongside)'
+      elif stats['resettable'] and stats['start_rss_mb'] is not None:
+        growth = f" (+{stats['peak_rss_mb'] - stats['start_rss_mb']:.1f} MB)"
+      print(f"{label}: peak RSS {stats['peak_rss_mb']:.1f} MB{growth}")
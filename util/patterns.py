@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Pattern catalog, in the column order of the boolean matrix and the bit order of packed codes
+PATTERNS = [
+  'Doji', 'Hammer', 'ShootingStar',
+  'BullishEngulfing', 'BearishEngulfing', 'BullishHarami', 'BearishHarami',
+  'MorningStar', 'EveningStar', 'ThreeWhiteSoldiers', 'ThreeBlackCrows',
+]
+
+# Shape thresholds, relative to the body or the high-low range of a candle
+DOJI_BODY = 0.1     # a doji's body is at most this share of its range
+WICK_BODY = 1.5     # a hammer's lower (shooting star's upper) wick is longer than this many bodies
+LONG_BODY = 0.5     # the first candle of a star has a body of at least this share of its range
+STAR_BODY = 0.3     # the middle candle of a star has a body of at most this share of the first one's
+
+# Patterns of a single candle; the others compare a candle with the ones before it
+SINGLE_PATTERNS = PATTERNS[:3]
+
+# Earlier candles a multi-bar pattern looks back on
+HISTORY = 2
+
+
+def previous_rows(keys):
+  """Row index of the previous row with the same key, -1 for the first row of each key.
+
+  Rows of one key keep their order; keys may be interleaved, as in a time-sorted multi-symbol frame.
+  """
+  n = len(keys)
+  order = np.argsort(keys, kind='stable')
+  ordered = keys[order]
+  prev_ordered = np.empty(n, dtype=np.int64)
+  prev_ordered[:1] = -1
+  prev_ordered[1:] = order[:-1]
+  prev_ordered[1:][ordered[1:] != ordered[:-1]] = -1
+  prev = np.empty(n, dtype=np.int64)
+  prev[order] = prev_ordered
+  return prev
+
+
+def _shift(values, prev):
+  """Values of the previous row of each row; NaN (or False) where there is none."""
+  fill = False if values.dtype == bool else np.nan
+  return np.where(prev >= 0, values[np.maximum(prev, 0)], fill)
+
+
+def detect(open, high, low, close, keys=None, single=False):
+  """Boolean (n, len(PATTERNS)) matrix of the candlestick patterns completed at each row.
+
+  Takes one array per price; body and wick arrays are computed once and multi-bar patterns
+  compare them with the previous rows of the same key (e.g. symbol), so a range starts
+  HISTORY candles early for its first rows to be complete. With `single`, only the (n, len(SINGLE_PATTERNS)) single-candle shapes are computed, for
+  rows that are not consecutive bars (e.g. snapshots of one running candle).
+  """
+  arrays = [np.asarray(values, dtype=float) for values in (open, high, low, close)]
+  labels = np.asarray(keys, dtype=object) if keys is not None else np.full(len(arrays[0]), '', dtype=object)
+  o, h, l, c = arrays
+
+  # Single-candle shape, computed once
+  top = np.maximum(o, c)
+  bottom = np.minimum(o, c)
+  body = top - bottom
+  span = h - l
+  upper = h - top
+  lower = bottom - l
+  bull = c > o
+  bear = c < o
+
+  with np.errstate(invalid='ignore'):
+    shapes = [
+      body <= span * DOJI_BODY,
+      (lower > WICK_BODY * body) & (upper < body),
+      (upper > WICK_BODY * body) & (lower < body),
+    ]
+  if single:
+    return np.column_stack(shapes)
+
+  # The same arrays one and two candles back within each key
+  prev = previous_rows(pd.factorize(labels)[0])
+  prev2 = np.where(prev >= 0, prev[np.maximum(prev, 0)], -1)
+  o1, c1, body1, bull1, bear1 = (_shift(v, prev) for v in (o, c, body, bull, bear))
+  o2, c2, body2, span2, bull2, bear2 = (_shift(v, prev2) for v in (o, c, body, span, bull, bear))
+
+  with np.errstate(invalid='ignore'):
+    star = (body1 <= STAR_BODY * body2) & (body2 >= LONG_BODY * span2)
+    patterns = shapes + [
+      bear1 & bull & (o <= c1) & (c >= o1) & (body > body1),
+      bull1 & bear & (o >= c1) & (c <= o1) & (body > body1),
+      bear1 & bull & (c < o1) & (o > c1),
+      bull1 & bear & (c > o1) & (o < c1),
+      bear2 & star & bull & (c > (o2 + c2) / 2),
+      bull2 & star & bear & (c < (o2 + c2) / 2),
+      bull2 & bull1 & bull & (c > c1) & (c1 > c2) & (o > o1) & (o <= c1) & (o1 > o2) & (o1 <= c2),
+      bear2 & bear1 & bear & (c < c1) & (c1 < c2) & (o < o1) & (o >= c1) & (o1 < o2) & (o1 >= c2),
+    ]
+
+  return np.column_stack(patterns)
+
+
+def pack(matrix):
+  """One uint16 code per row, bit i set when pattern PATTERNS[i] is present (SINGLE_PATTERNS are the low bits)."""
+  bits = np.zeros((len(matrix), 16), dtype=bool)
+  bits[:, :np.shape(matrix)[1]] = matrix
+  return np.packbits(bits, axis=1, bitorder='little').view('<u2').ravel()
+
+
+def unpack(codes):
+  """Boolean matrix of packed codes."""
+  bits = np.unpackbits(np.ascontiguousarray(codes, dtype='<u2').view(np.uint8).reshape(-1, 2), axis=1, bitorder='little')
+  return bits[:, :len(PATTERNS)].astype(bool)
@@ -1,6 +1,4 @@
 import matplotlib.pyplot as plt
-import mplfinance as mpf
-import seaborn as sns
 import pandas as pd
 
 
@@ -71,6 +69,8 @@ def sentiment_price_delta_scatter(
 
 def plot_candlestick(daily_data):
   """Create candlestick chart with indicators."""
+  import mplfinance as mpf
+
   # Define style
   mc = mpf.make_marketcolors(
       up='green', down='red', edge='inherit',
@@ -116,6 +116,8 @@ def plot_candlestick(daily_data):
 
 def plot_returns(analysis_df):
   """Plot returns analysis with outliers."""
+  import seaborn as sns
+
   fig, ax = plt.subplots(figsize=(15, 6))  # Matched size with technical analysis plots
   
   # Plot returns and bounds
@@ -208,8 +210,25 @@ def plot_technical_analysis(df, include_patterns=False):
   plt.tight_layout()
   return fig
 
-def plot_correlations(correlations, title:str = "Correlation of Features with Price "):
-  """Create correlations bar chart"""
+def plot_correlations(correlations, title:str = "Correlation of Features with Price ", lag=None):
+  """Create correlations bar chart
+
+  Takes a Series of correlations by feature, or the tidy frame of
+  util.analysis.calculate_correlations: its whole-sample rows at `lag`, or at each
+  feature's strongest lag when lag is None, labelled 'feature (lag k)', or
+  'feature ~ target (lag k)' when there is more than one target.
+  """
+  if isinstance(correlations, pd.DataFrame):
+    rows = correlations[correlations['window'] == 0].dropna(subset=['correlation'])
+    if lag is not None:
+      rows = rows[rows['lag'] == lag]
+    rows = rows.loc[rows['correlation'].abs().groupby([rows['feature'], rows['target']], observed=True).idxmax()]
+    if rows['target'].nunique() > 1:
+      labels = [f"{f} ~ {t} (lag {k})" for f, t, k in zip(rows['feature'], rows['target'], rows['lag'])]
+    else:
+      labels = [f"{f} (lag {k})" for f, k in zip(rows['feature'], rows['lag'])]
+    correlations = pd.Series(rows['correlation'].to_numpy(), index=labels)
+
   plt.figure(figsize=(15, 25))
 
   plt.subplot(5, 1, 5)
@@ -220,4 +239,4 @@ def plot_correlations(correlations, title:str = "Correlation of Features with Pr
   plt.ylabel('Correlation Coefficient', fontsize=14)
   plt.tight_layout()
 
-  plt.show()
\ No newline at end of file
+  plt.show()
@@ -0,0 +1,130 @@
+import pandas as pd
+from util.patterns import PATTERNS, HISTORY, detect
+from util.storage import save_frame, load_frame_tail, load_frame_range, replace_frame_tail
+
+# Bar sizes of the pyramid, finest first; each one is a whole number of the previous
+LEVELS = ['1h', '6h', '1D', '1W']
+
+# Indicators averaged over a bar, and the ones taken at its close
+MEAN_COLUMNS = ['SMA_5', 'SMA_10', 'RSI']
+LAST_COLUMNS = ['MACD', 'Signal_Line', 'MACD_Histogram']
+
+# Hourly columns the finest level is built from
+SOURCE_COLUMNS = ['time', 'symbol', 'price', 'volume', 'dayHigh', 'dayLow'] + MEAN_COLUMNS + LAST_COLUMNS
+
+# Bars hold partial aggregates (sums and counts for the means) so coarser bars can be
+# built from finer ones exactly; first/last/max/min/sum compose as they are
+TICK_AGG = {
+  'open': ('price', 'first'),
+  'close': ('price', 'last'),
+  'high': ('price', 'max'),
+  'low': ('price', 'min'),
+  'price_sum': ('price', 'sum'),
+  'price_n': ('price', 'count'),
+  'volume': ('volume', 'sum'),
+  'dayHigh': ('dayHigh', 'max'),
+  'dayLow': ('dayLow', 'min'),
+  **{name: spec for col in MEAN_COLUMNS for name, spec in [(col + '_sum', (col, 'sum')), (col + '_n', (col, 'count'))]},
+  **{col: (col, 'last') for col in LAST_COLUMNS},
+}
+
+BAR_AGG = {name: (name, {'first': 'first', 'last': 'last', 'max': 'max', 'min': 'min'}.get(how, 'sum'))
+           for name, (_, how) in TICK_AGG.items()}
+
+# Finished columns, in the order convert2_daily_price has always written them
+OHLCV_COLUMNS = ['symbol', 'time', 'open', 'close', 'price', 'volume', 'dayHigh', 'dayLow'] + MEAN_COLUMNS + LAST_COLUMNS
+
+
+def level_name(level):
+  """Stored frame name of one pyramid level."""
+  return f'rollup_{level}'
+
+
+def bar_start(times, level):
+  """Start of the bar holding each time; weekly bars start on Monday."""
+  if level == '1W':
+    return times.dt.to_period('W').dt.start_time
+  return times.dt.floor(level)
+
+
+def aggregate(rows, level, agg=BAR_AGG):
+  """Bars of one level per symbol from hourly rows (agg=TICK_AGG) or from the bars of a finer level."""
+  key = bar_start(pd.to_datetime(rows['time']), level).rename('time')
+  bars = rows.groupby(['symbol', key], observed=True).agg(**agg).reset_index()
+  # Bars in time order (symbols side by side), so incremental runs can replace the tail
+  return bars.sort_values(['time', 'symbol'], kind='stable').reset_index(drop=True)
+
+
+def build_pyramid(hourly, levels=LEVELS, persist=True):
+  """Every level from the hourly rows, each one derived from the level below it."""
+  pyramid = {}
+  bars, agg = hourly, TICK_AGG
+  for level in levels:
+    bars = aggregate(bars, level, agg)
+    agg = BAR_AGG
+    pyramid[level] = bars
+    if persist:
+      save_frame(bars, level_name(level))
+  return pyramid
+
+
+def update_pyramid(since, levels=LEVELS):
+  """Rebuild the stored bars from the one holding `since` upwards, level by level, and append them.
+
+  Each level rereads only the tail of the level below it, starting at its own first changed bar.
+  """
+  pyramid = {}
+  finer = None
+  for level in levels:
+    mark = bar_start(pd.Series([pd.Timestamp(since)]), level).iloc[0]
+    if finer is None:
+      rows = load_frame_tail('hourly_btc_tw_data', 'time', mark, columns=SOURCE_COLUMNS)
+      bars = aggregate(rows, level, TICK_AGG)
+    else:
+      bars = aggregate(load_frame_tail(level_name(finer), 'time', mark), level)
+    replace_frame_tail(bars, level_name(level), 'time', mark)
+    pyramid[level] = bars
+    finer = level
+  return pyramid
+
+
+def finish(bars):
+  """OHLCV rows with the mean price and indicators of each bar and the indicators at its close."""
+  df = bars[['symbol', 'time', 'open', 'close']].copy()
+  df['price'] = bars['price_sum'] / bars['price_n']
+  df[['volume', 'dayHigh', 'dayLow']] = bars[['volume', 'dayHigh', 'dayLow']]
+  for col in MEAN_COLUMNS:
+    df[col] = bars[col + '_sum'] / bars[col + '_n']
+  df[LAST_COLUMNS] = bars[LAST_COLUMNS]
+  return df[OHLCV_COLUMNS]
+
+
+def query(level, start=None, end=None, symbols=None, pyramid=None, with_patterns=False):
+  """Finished bars of one level with start <= time < end, read from processed/ unless handed over.
+
+  With `with_patterns`, one boolean column per util.patterns.PATTERNS name is added from each
+  bar's open, high, low and close; the bars just before start are read as well, so multi-bar
+  patterns at the start of the range see the candles they build on.
+  """
+  first = start
+  if with_patterns and start is not None:
+    first = pd.Timestamp(start) - HISTORY * pd.Timedelta(level)
+  if pyramid is not None:
+    bars = pyramid[level]
+    if first is not None:
+      bars = bars[bars['time'] >= pd.Timestamp(first)]
+    if end is not None:
+      bars = bars[bars['time'] < pd.Timestamp(end)]
+  else:
+    bars = load_frame_range(level_name(level), 'time', first, end)
+  if symbols is not None:
+    bars = bars[bars['symbol'].isin(symbols)]
+
+  df = finish(bars)
+  if with_patterns:
+    matrix = detect(bars['open'], bars['high'], bars['low'], bars['close'], keys=bars['symbol'].astype(str).to_numpy())
+    for i, name in enumerate(PATTERNS):
+      df[name] = matrix[:, i]
+    if start is not None:
+      df = df[df['time'] >= pd.Timestamp(start)]
+  return df.reset_index(drop=True)
@@ -0,0 +1,184 @@
+# Import external libraries
+import os
+import json
+import time
+import argparse
+import datetime
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+# Directory of saved model artifacts
+MODEL_DIR = './models'
+
+# Bumped whenever the artifact layout changes
+ARTIFACT_FORMAT = 1
+
+
+def save_artifact(scaler, model, features, model_dir=MODEL_DIR, metadata=None):
+  """Save the fitted scaler and model together as one versioned artifact and return its path."""
+  os.makedirs(model_dir, exist_ok=True)
+  version = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+  path = os.path.join(model_dir, f'random_forest_{version}.joblib')
+
+  joblib.dump({
+    'format': ARTIFACT_FORMAT,
+    'version': version,
+    'sklearn_version': sklearn.__version__,
+    'features': list(features),
+    'scaler': scaler,
+    'model': model,
+    'metadata': metadata or {},
+  }, path)
+
+  return path
+
+
+def latest_artifact(model_dir=MODEL_DIR):
+  """Path of the most recently saved artifact."""
+  paths = sorted(f for f in os.listdir(model_dir) if f.startswith('random_forest_') and f.endswith('.joblib'))
+  if not paths:
+    raise FileNotFoundError(f"No model artifact in {model_dir}")
+  return os.path.join(model_dir, paths[-1])
+
+
+def load_artifact(path=None):
+  """Load an artifact saved by save_artifact, by default the latest one."""
+  artifact = joblib.load(path or latest_artifact())
+  if artifact.get('format') != ARTIFACT_FORMAT:
+    raise ValueError(f"Unsupported artifact format {artifact.get('format')}, expected {ARTIFACT_FORMAT}")
+  return artifact
+
+
+class Predictor:
+  """Long-lived next-day direction predictor that loads its artifact once."""
+
+  def __init__(self, path=None, latency_window=10000, compiled=False):
+    artifact = load_artifact(path)
+    self.version = artifact['version']
+    self.features = artifact['features']
+    self.metadata = artifact.get('metadata', {})
+    self.scaler = artifact['scaler']
+    self.model = artifact['model']
+    self.up_column = list(self.model.classes_).index(1)
+
+    # Single-threaded scoring avoids joblib start-up on every small request
+    if hasattr(self.model, 'n_jobs'):
+      self.model.n_jobs = 1
+
+    # Optionally score raw rows with the array form of the forest, the scaler folded in
+    self.compiled = None
+    if compiled:
+      from util.compiled_forest import CompiledForest
+      self.compiled = CompiledForest(self.model, self.scaler)
+
+    self.latencies = deque(maxlen=latency_window)
+    self.lock = threading.Lock()
+
+  def _to_matrix(self, rows):
+    """Accept one row or a batch as dicts, a DataFrame or arrays ordered like self.features."""
+    if isinstance(rows, dict):
+      rows = [rows]
+    if isinstance(rows, pd.DataFrame):
+      return rows[self.features].to_numpy(dtype=float)
+    if len(rows) and isinstance(rows[0], dict):
+      return np.array([[row[name] for name in self.features] for row in rows], dtype=float)
+
+    matrix = np.asarray(rows, dtype=float)
+    matrix = matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+    if matrix.shape[1] != len(self.features):
+      raise ValueError(f"Expected {len(self.features)} features, got {matrix.shape[1]}")
+    return matrix
+
+  def predict_proba(self, rows):
+    """Probability that the next day's price goes up, one value per row."""
+    start = time.perf_counter()
+    if self.compiled is not None:
+      proba = self.compiled.predict_proba(self._to_matrix(rows))[:, self.up_column]
+    else:
+      # The scaler was fit on a DataFrame, so keep the column names to match
+      X = pd.DataFrame(self._to_matrix(rows), columns=self.features)
+      proba = self.model.predict_proba(self.scaler.transform(X))[:, self.up_column]
+
+    with self.lock:
+      self.latencies.append(time.perf_counter() - start)
+    return proba
+
+  def metrics(self):
+    """Request count and p50/p99 prediction latency in milliseconds."""
+    with self.lock:
+      latencies = np.array(self.latencies) * 1000
+    if len(latencies) == 0:
+      return {'version': self.version, 'count': 0, 'p50_ms': None, 'p99_ms': None}
+    return {
+      'version': self.version,
+      'count': len(latencies),
+      'p50_ms': float(np.percentile(latencies, 50)),
+      'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def make_handler(predictor):
+  """HTTP handler: POST /predict with {"rows": [...]} or one row object; GET /metrics and /health."""
+
+  class Handler(BaseHTTPRequestHandler):
+    def _reply(self, status, payload):
+      body = json.dumps(payload).encode('utf-8')
+      self.send_response(status)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def do_GET(self):
+      if self.path == '/metrics':
+        self._reply(200, predictor.metrics())
+      elif self.path == '/health':
+        self._reply(200, {'status': 'ok', 'version': predictor.version})
+      else:
+        self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+      if self.path != '/predict':
+        self._reply(404, {'error': 'not found'})
+        return
+      try:
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        rows = request['rows'] if isinstance(request, dict) and 'rows' in request else request
+        self._reply(200, {'version': predictor.version, 'probabilities': predictor.predict_proba(rows).tolist()})
+      except (ValueError, KeyError, TypeError) as e:
+        self._reply(400, {'error': str(e)})
+
+    def log_message(self, format, *args):
+      # Keep the request path quiet; latency is exposed through /metrics
+      pass
+
+  return Handler
+
+
+def serve(predictor, host='127.0.0.1', port=8000):
+  """Serve predictions over HTTP until interrupted."""
+  server = ThreadingHTTPServer((host, port), make_handler(predictor))
+  print(f"Serving model {predictor.version} on http://{host}:{port}")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser(description='Serve next-day direction predictions')
+  cli.add_argument('--model', default=None, help='artifact path (default: latest in ./models)')
+  cli.add_argument('--host', default='127.0.0.1')
+  cli.add_argument('--port', type=int, default=8000)
+  cli.add_argument('--compiled', action='store_true',
+                   help='score with the compiled array form of the forest (same predictions)')
+  args = cli.parse_args()
+
+  serve(Predictor(args.model, compiled=args.compiled), args.host, args.port)
@@ -0,0 +1,98 @@
+import io
+import os
+import csv
+import json
+import pandas as pd
+
+# Small JSON file holding the incremental pipeline high-water marks
+STATE_PATH = './processed/pipeline_state.json'
+
+# Bytes read per step when scanning a CSV backwards
+_BLOCK_SIZE = 1 << 20
+
+
+def load_state(path=STATE_PATH):
+  """Load the incremental pipeline state, or an empty state on the first run."""
+  if not os.path.exists(path):
+    return {}
+  with open(path) as f:
+    return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+  """Atomically write the incremental pipeline state."""
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'w') as f:
+    json.dump(state, f, indent=2, default=str)
+  os.replace(tmp_path, path)
+
+
+def _parse_time(value):
+  try:
+    return pd.Timestamp(value)
+  except (ValueError, TypeError):
+    return pd.NaT
+
+
+def _tail_offset(f, column, since):
+  """Return the header and the byte offset of the first row whose column is >= since in a time-sorted CSV."""
+  f.seek(0)
+  header = f.readline()
+  data_start = f.tell()
+  col = next(csv.reader([header.decode('utf-8')])).index(column)
+
+  # Fast path: the whole file is newer than the mark
+  first = f.readline()
+  if first.strip():
+    first_time = _parse_time(next(csv.reader([first.decode('utf-8')]))[col])
+    if first_time is not pd.NaT and first_time >= since:
+      return header, data_start
+
+  # Walk backwards block by block until a row older than the mark is found
+  f.seek(0, os.SEEK_END)
+  pos = line_end = size = f.tell()
+  partial = b''
+  while pos > data_start:
+    new_pos = max(data_start, pos - _BLOCK_SIZE)
+    f.seek(new_pos)
+    buffer = f.read(pos - new_pos) + partial
+    pos = new_pos
+
+    lines = buffer.split(b'\n')
+    partial = lines.pop(0) if pos > data_start else b''
+
+    for line in reversed(lines):
+      line_start = line_end - len(line)
+      if line.strip():
+        row_time = _parse_time(next(csv.reader([line.decode('utf-8')]))[col])
+        if row_time is not pd.NaT and row_time < since:
+          return header, min(line_end + 1, size)
+      line_end = line_start - 1
+
+  return header, data_start
+
+
+def read_csv_tail(path, column, since, **kwargs):
+  """Read only the trailing rows of a time-sorted CSV whose column is >= since."""
+  with open(path, 'rb') as f:
+    header, offset = _tail_offset(f, column, pd.Timestamp(since))
+    f.seek(offset)
+    body = f.read()
+
+  return pd.read_csv(io.BytesIO(header + body), **kwargs)
+
+
+def replace_tail_csv(path, df, column, since, index=False):
+  """Drop the trailing rows of a time-sorted CSV whose column is >= since and append df in their place."""
+  if not os.path.exists(path):
+    df.to_csv(path, index=index)
+    return
+
+  with open(path, 'rb+') as f:
+    header, offset = _tail_offset(f, column, pd.Timestamp(since))
+    f.truncate(offset)
+
+  # Write columns in the order of the existing header
+  columns = next(csv.reader([header.decode('utf-8')]))
+  df = df[columns[1:] if index else columns]
+  df.to_csv(path, mode='a', header=False, index=index)
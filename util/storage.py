@@ -0,0 +1,239 @@
+import os
+import shutil
+import pandas as pd
+from util.state import read_csv_tail, replace_tail_csv
+
+# Directory holding the pipeline intermediates
+PROCESSED_DIR = './processed'
+
+# Storage format of the intermediates: 'parquet', 'arrow' (Arrow IPC) or 'csv'
+STORAGE_FORMAT = os.environ.get('PIPELINE_STORAGE', 'parquet')
+
+_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+
+
+def set_format(fmt):
+  """Select the storage format used by every later save/load call."""
+  global STORAGE_FORMAT
+  if fmt not in _EXTENSIONS:
+    raise ValueError(f"Unknown storage format '{fmt}', expected one of {sorted(_EXTENSIONS)}")
+  STORAGE_FORMAT = fmt
+
+
+def frame_path(name, fmt=None):
+  """Path of a stored frame; columnar frames are directories of time-ordered part files."""
+  return os.path.join(PROCESSED_DIR, name + _EXTENSIONS[fmt or STORAGE_FORMAT])
+
+
+def exists(name, fmt=None):
+  return os.path.exists(frame_path(name, fmt))
+
+
+'''
+Columnar part files
+'''
+def _parts(path):
+  if not os.path.isdir(path):
+    return []
+  return sorted(
+    os.path.join(path, f) for f in os.listdir(path) if f.startswith('part-') and not f.endswith('.tmp')
+  )
+
+
+def _read_part(part, fmt, columns=None):
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+
+  if fmt == 'parquet':
+    return pq.read_table(part, columns=columns)
+
+  # Arrow IPC files are memory-mapped, so projected-away columns are never paged in
+  table = pa.ipc.open_file(pa.memory_map(part, 'r')).read_all()
+  return table.select(columns) if columns is not None else table
+
+
+def _read_schema(part, fmt):
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+
+  if fmt == 'parquet':
+    return pq.read_schema(part)
+  return pa.ipc.open_file(pa.memory_map(part, 'r')).schema
+
+
+def _write_part(table, part, fmt):
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+
+  # Write beside the target and rename, so memory-mapped readers keep a valid file
+  tmp_part = part + '.tmp'
+  if fmt == 'parquet':
+    pq.write_table(table, tmp_part)
+  else:
+    with pa.OSFile(tmp_part, 'wb') as sink:
+      with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+  os.replace(tmp_part, part)
+
+
+def _next_part(path, fmt):
+  parts = _parts(path)
+  number = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+  return os.path.join(path, f'part-{number:05d}{_EXTENSIONS[fmt]}')
+
+
+def _to_table(df, index):
+  import pyarrow as pa
+  return pa.Table.from_pandas(df.reset_index() if index else df, preserve_index=False)
+
+
+def _concat(tables):
+  import pyarrow as pa
+  return pa.concat_tables(tables, promote_options='default')
+
+
+'''
+Public API
+'''
+def save_frame(df, name, fmt=None, index=False):
+  """Write a frame, replacing any previous version."""
+  fmt = fmt or STORAGE_FORMAT
+  path = frame_path(name, fmt)
+  os.makedirs(PROCESSED_DIR, exist_ok=True)
+
+  if fmt == 'csv':
+    df.to_csv(path, index=index)
+    return
+
+  shutil.rmtree(path, ignore_errors=True)
+  os.makedirs(path)
+  _write_part(_to_table(df, index), _next_part(path, fmt), fmt)
+
+
+def load_frame(name, columns=None, fmt=None):
+  """Read a stored frame, loading only the requested columns."""
+  fmt = fmt or STORAGE_FORMAT
+  path = frame_path(name, fmt)
+
+  if not os.path.exists(path):
+    raise FileNotFoundError(path)
+  if fmt == 'csv':
+    return pd.read_csv(path, usecols=columns)
+
+  tables = [_read_part(part, fmt, columns) for part in _parts(path)]
+  return _concat(tables).to_pandas()
+
+
+def load_frame_tail(name, column, since, columns=None, fmt=None):
+  """Read only the trailing rows of a time-ordered frame whose column is >= since."""
+  fmt = fmt or STORAGE_FORMAT
+  path = frame_path(name, fmt)
+  since = pd.Timestamp(since)
+  if columns is not None and column not in columns:
+    columns = [column] + list(columns)
+
+  if fmt == 'csv':
+    df = read_csv_tail(path, column, since)
+    return df[columns] if columns is not None else df
+
+  # Walk the parts backwards until one starts before the mark
+  tables = []
+  for part in reversed(_parts(path)):
+    table = _read_part(part, fmt, columns)
+    times = table.column(column).to_pandas()
+    tables.insert(0, table)
+    if len(times) and times.iloc[0] < since:
+      break
+
+  df = _concat(tables).to_pandas() if tables else pd.DataFrame(columns=columns)
+  return df[df[column] >= since].reset_index(drop=True)
+
+
+def load_frame_range(name, column, start=None, end=None, columns=None, fmt=None):
+  """Read the rows of a time-ordered frame with start <= column < end; None leaves a side open."""
+  import pyarrow as pa
+  import pyarrow.compute as pc
+  import pyarrow.parquet as pq
+
+  fmt = fmt or STORAGE_FORMAT
+  path = frame_path(name, fmt)
+  start = pd.Timestamp(start) if start is not None else None
+  end = pd.Timestamp(end) if end is not None else None
+  if columns is not None and column not in columns:
+    columns = [column] + list(columns)
+
+  if not os.path.exists(path):
+    raise FileNotFoundError(path)
+  if fmt == 'csv':
+    df = read_csv_tail(path, column, start) if start is not None else pd.read_csv(path)
+    df[column] = pd.to_datetime(df[column])
+    if start is not None:
+      df = df[df[column] >= start]
+    if end is not None:
+      df = df[df[column] < end]
+    df = df[columns] if columns is not None else df
+    return df.reset_index(drop=True)
+
+  filters = []
+  if start is not None:
+    filters.append((column, '>=', start))
+  if end is not None:
+    filters.append((column, '<', end))
+
+  tables = []
+  for part in _parts(path):
+    if fmt == 'parquet':
+      # Row-group statistics let parquet skip the groups outside the range unread
+      tables.append(pq.read_table(part, columns=columns, filters=filters or None))
+      continue
+
+    table = _read_part(part, fmt, columns)
+    times = table.column(column)
+    keep = None
+    for op, bound in [(pc.greater_equal, start), (pc.less, end)]:
+      if bound is not None:
+        mask = op(times, pa.scalar(bound, type=times.type))
+        keep = mask if keep is None else pc.and_(keep, mask)
+    tables.append(table.filter(keep) if keep is not None else table)
+
+  if not tables:
+    return pd.DataFrame(columns=columns)
+  return _concat(tables).to_pandas()
+
+
+def replace_frame_tail(df, name, column, since, fmt=None, index=False):
+  """Drop the trailing rows of a time-ordered frame whose column is >= since and append df."""
+  fmt = fmt or STORAGE_FORMAT
+  path = frame_path(name, fmt)
+  since = pd.Timestamp(since)
+
+  if fmt == 'csv':
+    replace_tail_csv(path, df, column, since, index=index)
+    return
+  if not os.path.isdir(path):
+    save_frame(df, name, fmt, index)
+    return
+
+  # Trim the parts that reach past the mark, newest first
+  parts = _parts(path)
+  for part in reversed(parts):
+    table = _read_part(part, fmt)
+    times = table.column(column).to_pandas()
+    if len(times) and times.iloc[0] < since:
+      keep = (times < since).to_numpy()
+      _write_part(table.filter(keep), part, fmt)
+      break
+    os.remove(part)
+
+  # Append the new rows as a new part, in the column order of the existing schema
+  table = _to_table(df, index)
+  if parts and os.path.exists(parts[0]):
+    names = _read_schema(parts[0], fmt).names
+    table = table.select([n for n in names if n in table.schema.names])
+  _write_part(table, _next_part(path, fmt), fmt)
+
+
+def export_csv(name, fmt=None):
+  """Write a CSV copy of a stored frame next to it."""
+  df = load_frame(name, fmt=fmt)
+  df.to_csv(frame_path(name, 'csv'), index=False)
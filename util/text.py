@@ -1,28 +1,128 @@
-import re
-from flair.data import Sentence
-from flair.nn import Classifier
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from importlib import metadata
+import numpy as np
+import pandas as pd
+# VADER analyzer, shared with util.vader and built on first use
+from util.vader import get_analyzer
 
-# Flair tagger
-tagger = Classifier.load('sentiment')
-# VADER analyzer
-analyzer = SentimentIntensityAnalyzer()
+# Flair tagger, loaded on first use by get_tagger()
+tagger = None
 
+# Output columns of flair_sentiment_batch when added to a frame
+FLAIR_COLUMNS = ['fl_label', 'fl_score']
+
+
+def get_tagger():
+  """Load the Flair sentiment classifier once, on CPU, the first time it is needed."""
+  global tagger
+  if tagger is None:
+    import flair
+    import torch
+    from flair.nn import Classifier
+
+    flair.device = torch.device('cpu')
+    tagger = Classifier.load('sentiment')
+  return tagger
+
+
+def flair_version():
+  """Return the package and model fingerprint used to key cached Flair scores."""
+  return f"flair-{metadata.version('flair')}-sentiment"
+
+
+def flair_sentiment(input:str, cache=None):
+  from flair.data import Sentence
 
-def flair_sentiment(input:str):
   if (len(input) > 0):
+    # Reuse a previously cached label/score for this exact text
+    if cache is not None:
+      cached = cache.get_many(flair_version(), [input])
+      if input in cached:
+        label, score = cached[input]
+        return label, score
+
     sentence = Sentence(input)
-    tagger.predict(sentence)
-    return sentence.labels[0].value, sentence.labels[0].score 
+    get_tagger().predict(sentence)
+    result = sentence.labels[0].value, sentence.labels[0].score
+
+    if cache is not None:
+      cache.put_many(flair_version(), {input: result})
+    return result
   else:
     print("String is empty. No result.")
     return
 
 
+def _predict_sorted(texts, mini_batch_size, bucket_size):
+  """Predict texts already sorted by length, one bucket of similar lengths at a time."""
+  labels = np.empty(len(texts), dtype=object)
+  scores = np.full(len(texts), np.nan)
+  if len(texts) == 0:
+    return labels, scores
+
+  from flair.data import Sentence
+  model = get_tagger()
+
+  for start in range(0, len(texts), bucket_size):
+    sentences = [Sentence(text) for text in texts[start:start + bucket_size]]
+    model.predict(sentences, mini_batch_size=mini_batch_size)
+
+    for i, sentence in enumerate(sentences, start):
+      if sentence.labels:
+        labels[i] = sentence.labels[0].value
+        scores[i] = sentence.labels[0].score
+
+  return labels, scores
+
+
+def flair_sentiment_batch(texts, mini_batch_size=32, bucket_size=None, cache=None):
+  """Label and score arrays for a list or Series of texts, aligned to the input order.
+
+  Each distinct text is predicted once. Texts are sorted by length so every mini-batch pads
+  to a similar length, and fed to the tagger `bucket_size` sentences at a time to bound memory.
+  Empty or missing texts get a None label and a NaN score.
+  """
+  bucket_size = bucket_size or mini_batch_size * 32
+
+  # Predict each distinct non-empty text only once
+  codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+  uniques = list(uniques)
+  unique_labels = np.empty(len(uniques), dtype=object)
+  unique_scores = np.full(len(uniques), np.nan)
+
+  # Fill what the cache already knows and predict the rest
+  missing = [i for i, text in enumerate(uniques) if isinstance(text, str) and text.strip()]
+  if cache is not None:
+    cached = cache.get_many(flair_version(), [uniques[i] for i in missing])
+    for i in missing:
+      if uniques[i] in cached:
+        unique_labels[i], unique_scores[i] = cached[uniques[i]]
+    missing = [i for i in missing if uniques[i] not in cached]
+
+  # Length buckets: shortest texts first
+  missing.sort(key=lambda i: len(uniques[i]))
+  new_labels, new_scores = _predict_sorted([uniques[i] for i in missing], mini_batch_size, bucket_size)
+  unique_labels[missing] = new_labels
+  unique_scores[missing] = new_scores
+
+  if cache is not None:
+    cache.put_many(flair_version(), {
+      uniques[i]: (label, float(score))
+      for i, label, score in zip(missing, new_labels, new_scores) if label is not None
+    })
+
+  # Broadcast back to the input order; missing texts stay None/NaN
+  labels = np.empty(len(codes), dtype=object)
+  scores = np.full(len(codes), np.nan)
+  labels[codes >= 0] = unique_labels[codes[codes >= 0]]
+  scores[codes >= 0] = unique_scores[codes[codes >= 0]]
+
+  return labels, scores
+
+
 def vader_sentiment(input:str):
   if input and len(input) > 0:
-    vs = analyzer.polarity_scores(input)
+    vs = get_analyzer().polarity_scores(input)
     return vs['neg'], vs['neu'], vs['pos'], vs['compound']
   else:
     print("String is empty. No result.")
-    return 
+    return
@@ -2,22 +2,23 @@
 # Import external libraries
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 
 def split_data(df_clean, technical_features, sentiment_features, price_features):
   # Split data for machine learning
   X = df_clean[technical_features + sentiment_features + price_features + ['volatility']]
   y = df_clean['target']
-  X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+  # Keep time order: the test set is the most recent 20% of days, so no future prices leak into training
+  X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
 
   return X_train, X_test, y_train, y_test 
  
-def scale_features(X_train, X_test):
+def scale_features(X_train, X_test, return_scaler=False):
   # Scale features
   scaler = StandardScaler()
   X_train_scaled = scaler.fit_transform(X_train)
   X_test_scaled = scaler.transform(X_test)
 
+  if return_scaler:
+    return X_train_scaled, X_test_scaled, scaler
   return X_train_scaled, X_test_scaled
 
@@ -0,0 +1,127 @@
+# Import external libraries
+import os
+import json
+import math
+import time
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+# Import utility functions
+from util.train import scale_features
+
+# Searched hyperparameters
+PARAM_GRID = {
+  'max_depth': [None, 4, 8, 16],
+  'max_features': ['sqrt', 'log2', None],
+  'min_samples_leaf': [1, 2, 4, 8],
+}
+
+# Successive-halving budget: trees per rung, grown with warm_start
+N_ESTIMATORS = [25, 50, 100, 200]
+
+# Fold results of earlier (possibly interrupted) searches
+CACHE_PATH = './processed/tuning_cache.json'
+
+_SCORERS = {'accuracy': accuracy_score, 'f1': f1_score}
+
+
+def _load_cache(path):
+  if path is None or not os.path.exists(path):
+    return {}
+  with open(path) as f:
+    return json.load(f)
+
+
+def _save_cache(cache, path):
+  if path is None:
+    return
+  tmp_path = path + '.tmp'
+  with open(tmp_path, 'w') as f:
+    json.dump(cache, f)
+  os.replace(tmp_path, path)
+
+
+def _data_hash(X, y):
+  """Fingerprint of the training data so cached fold results are never reused for other data."""
+  digest = hashlib.sha1(np.ascontiguousarray(X, dtype=float).tobytes())
+  digest.update(np.ascontiguousarray(y).tobytes())
+  return digest.hexdigest()[:16]
+
+
+def tune_random_forest(X_train, y_train, param_grid=PARAM_GRID, n_estimators=N_ESTIMATORS, cv=None,
+                       eta=2, scoring='accuracy', n_jobs=-1, random_state=42, cache_path=CACHE_PATH):
+  """Successive-halving search over random forest hyperparameters with warm-started trees."""
+  cv = cv or TimeSeriesSplit(n_splits=3)
+  score = _SCORERS[scoring]
+  cache = _load_cache(cache_path)
+  data_hash = _data_hash(X_train, y_train)
+
+  # Scale every fold once with the shared helper; the fold indices go into the cache key,
+  # so scores of another splitter (e.g. the shuffled KFold of earlier runs) are never reused
+  folds = []
+  split_digest = hashlib.sha1()
+  for train_idx, val_idx in cv.split(X_train):
+    X_tr, X_val = scale_features(X_train.iloc[train_idx], X_train.iloc[val_idx])
+    folds.append((X_tr, y_train.iloc[train_idx], X_val, y_train.iloc[val_idx]))
+    for idx in (train_idx, val_idx):
+      split_digest.update(np.ascontiguousarray(idx, dtype=np.int64).tobytes() + b'|')
+  split_hash = split_digest.hexdigest()[:16]
+
+  keys = list(param_grid)
+  candidates = [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+  models = {}
+  results = []
+
+  for rung, trees in enumerate(n_estimators):
+    scores = []
+    for cand_id, params in enumerate(candidates):
+      start = time.perf_counter()
+      fold_scores = []
+
+      for fold, (X_tr, y_tr, X_val, y_val) in enumerate(folds):
+        key = f"{data_hash}|{split_hash}|{random_state}|{json.dumps(params, sort_keys=True)}|{scoring}|{trees}|{fold}"
+        if key in cache:
+          fold_scores.append(cache[key])
+          continue
+
+        # Grow the forest of the previous rung instead of refitting it from scratch
+        model = models.get((cand_id, fold))
+        if model is None:
+          model = RandomForestClassifier(warm_start=True, n_jobs=n_jobs, random_state=random_state, **params)
+          models[(cand_id, fold)] = model
+        model.set_params(n_estimators=trees)
+        model.fit(X_tr, y_tr)
+
+        cache[key] = float(score(y_val, model.predict(X_val)))
+        fold_scores.append(cache[key])
+
+      wall_time = time.perf_counter() - start
+      _save_cache(cache, cache_path)
+
+      mean_score = float(np.mean(fold_scores))
+      scores.append(mean_score)
+      results.append({**params, 'rung': rung, 'n_estimators': trees, 'score': mean_score, 'wall_time': wall_time})
+      print(f"rung {rung} | {trees:4d} trees | {params} | {scoring} {mean_score:.4f} | {wall_time:.2f}s")
+
+    # Keep the best 1/eta of the candidates for the next, larger budget
+    if rung < len(n_estimators) - 1:
+      keep = max(1, math.ceil(len(candidates) / eta))
+      order = np.argsort(scores, kind='stable')[::-1][:keep]
+      kept = {cand_id: candidates[cand_id] for cand_id in order}
+      models = {(new_id, fold): models[(cand_id, fold)]
+                for new_id, cand_id in enumerate(kept) for fold in range(len(folds))
+                if (cand_id, fold) in models}
+      candidates = list(kept.values())
+
+  best = int(np.argmax(scores))
+  results = pd.DataFrame(results)
+
+  return {
+    'params': {**candidates[best], 'n_estimators': n_estimators[-1]},
+    'score': scores[best],
+    'results': results,
+  }
@@ -1,14 +1,122 @@
-import re
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from importlib import metadata
+from concurrent.futures import ProcessPoolExecutor
 
-# VADER analyzer
-analyzer = SentimentIntensityAnalyzer()
+# VADER analyzer, built on first use by get_analyzer() since loading the lexicon is slow
+analyzer = None
+
+# Output columns, in the order returned by vader_sentiment
+VADER_COLUMNS = ['vd_negative', 'vd_neutral', 'vd_positive', 'vd_compound']
+
+# Analyzer owned by a pool worker process
+_worker_analyzer = None
+
+# Package and lexicon fingerprint used to key cached scores
+_version = None
+
+
+def get_analyzer():
+  """Build the shared VADER analyzer the first time it is needed."""
+  global analyzer
+  if analyzer is None:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    analyzer = SentimentIntensityAnalyzer()
+  return analyzer
 
 
 def vader_sentiment(input:str):
   if input and len(input) > 0:
-    vs = analyzer.polarity_scores(input)
+    vs = get_analyzer().polarity_scores(input)
     return vs['neg'], vs['neu'], vs['pos'], vs['compound']
   else:
     print("String is empty. No result.")
-    return 
+    return
+
+
+def vader_version():
+  """Return the package and lexicon fingerprint used to key cached VADER scores."""
+  global _version
+  if _version is None:
+    scorer = get_analyzer()
+    lexicon = repr(sorted(scorer.lexicon.items())) + repr(sorted(scorer.emojis.items()))
+    digest = hashlib.sha1(lexicon.encode('utf-8')).hexdigest()[:12]
+    _version = f"vader-{metadata.version('vaderSentiment')}-{digest}"
+  return _version
+
+
+def _init_worker():
+  """Build one VADER analyzer per worker process."""
+  global _worker_analyzer
+  from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+  _worker_analyzer = SentimentIntensityAnalyzer()
+
+
+def _score_chunk(chunk):
+  """Score one chunk of texts and return its offset with an (n, 4) float array."""
+  start, texts = chunk
+  scorer = _worker_analyzer or get_analyzer()
+  scores = np.full((len(texts), 4), np.nan)
+
+  for i, text in enumerate(texts):
+    if text and len(text) > 0:
+      vs = scorer.polarity_scores(text)
+      scores[i] = vs['neg'], vs['neu'], vs['pos'], vs['compound']
+
+  return start, scores
+
+
+def _score_texts(texts, n_jobs, chunk_size):
+  """Score texts in chunks across a process pool into an (n, 4) float array."""
+  scores = np.full((len(texts), 4), np.nan)
+  if len(texts) == 0:
+    return scores
+
+  # Split the texts into fixed-size chunks tagged with their offset
+  chunks = [(start, texts[start:start + chunk_size]) for start in range(0, len(texts), chunk_size)]
+  n_jobs = min(n_jobs or os.cpu_count() or 1, len(chunks))
+
+  # Small inputs are not worth the pool start-up cost
+  if n_jobs == 1:
+    for start, chunk_scores in map(_score_chunk, chunks):
+      scores[start:start + len(chunk_scores)] = chunk_scores
+    return scores
+
+  with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker) as pool:
+    for start, chunk_scores in pool.map(_score_chunk, chunks):
+      scores[start:start + len(chunk_scores)] = chunk_scores
+
+  return scores
+
+
+def vader_sentiment_batch(texts, n_jobs=None, chunk_size=5000, cache=None):
+  """Score texts into an (n, 4) float array ordered as VADER_COLUMNS, scoring each unique text once."""
+  # Score each distinct text only once
+  codes, uniques = pd.factorize(pd.Series(texts, dtype=object))
+  uniques = list(uniques)
+  unique_scores = np.full((len(uniques), 4), np.nan)
+
+  # Fill what the cache already knows and score the rest
+  missing = list(range(len(uniques)))
+  if cache is not None:
+    cached = cache.get_many(vader_version(), uniques)
+    missing = [i for i, text in enumerate(uniques) if text not in cached]
+    for i, text in enumerate(uniques):
+      if text in cached:
+        unique_scores[i] = cached[text]
+
+  new_scores = _score_texts([uniques[i] for i in missing], n_jobs, chunk_size)
+  unique_scores[missing] = new_scores
+
+  if cache is not None:
+    cache.put_many(vader_version(), {
+      uniques[i]: tuple(row) for i, row in zip(missing, new_scores) if not np.isnan(row).any()
+    })
+
+  # Broadcast the unique scores back to the input order; missing texts stay NaN
+  scores = np.full((len(codes), 4), np.nan)
+  scores[codes >= 0] = unique_scores[codes[codes >= 0]]
+
+  return scores
@@ -0,0 +1,128 @@
+# Import external libraries
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+# Import utility functions
+from util.train import scale_features
+from util.random_forest import train_model, evaluate_model
+
+# Training data shared with fold worker processes
+_X = None
+_y = None
+
+
+def walk_forward_splits(n_rows, min_train=30, test_size=5, window='expanding', train_size=None):
+  """Yield (train_start, train_end, test_end) row bounds of chronological walk-forward folds."""
+  if window not in ('expanding', 'sliding'):
+    raise ValueError(f"Unknown window '{window}', expected 'expanding' or 'sliding'")
+  train_size = train_size or min_train
+
+  for train_end in range(min_train, n_rows, test_size):
+    train_start = 0 if window == 'expanding' else max(0, train_end - train_size)
+    yield train_start, train_end, min(train_end + test_size, n_rows)
+
+
+class GrowingForest:
+  """Forest grown across expanding windows; each segment of trees keeps the scaler it was fit with."""
+
+  def __init__(self):
+    self.segments = []
+
+  def add(self, scaler, model):
+    self.segments.append((scaler, model))
+
+  @property
+  def n_estimators(self):
+    return sum(len(model.estimators_) for _, model in self.segments)
+
+  @property
+  def classes_(self):
+    return np.unique(np.concatenate([model.classes_ for _, model in self.segments]))
+
+  def predict_proba(self, X):
+    """Average the class probabilities of every tree, weighting segments by their tree count."""
+    classes = self.classes_
+    proba = np.zeros((len(X), len(classes)))
+    for scaler, model in self.segments:
+      columns = np.searchsorted(classes, model.classes_)
+      proba[:, columns] += model.predict_proba(scaler.transform(X)) * len(model.estimators_)
+    return proba / self.n_estimators
+
+  def predict(self, X):
+    return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def _init_worker(X, y):
+  global _X, _y
+  _X, _y = X, y
+
+
+def _fold_metrics(model, X_test, y_test, fit_time):
+  """Predict one fold, timing the prediction, and collect its metrics."""
+  start = time.perf_counter()
+  y_pred = model.predict(X_test)
+  predict_time = time.perf_counter() - start
+
+  accuracy, precision, recall, f1, _ = evaluate_model(model, X_test, y_test, y_pred=y_pred, verbose=False)
+  return {
+    'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1': f1,
+    'fit_time': fit_time, 'predict_time': predict_time,
+  }
+
+
+def _run_fold(task):
+  """Refit the scaler and model on one training window and score the following test window."""
+  (train_start, train_end, test_end), params = task
+  X_train, X_test = _X.iloc[train_start:train_end], _X.iloc[train_end:test_end]
+  y_train, y_test = _y.iloc[train_start:train_end], _y.iloc[train_end:test_end]
+
+  start = time.perf_counter()
+  X_train_scaled, X_test_scaled = scale_features(X_train, X_test)
+  model = train_model(X_train_scaled, y_train, **params)
+  fit_time = time.perf_counter() - start
+
+  return _fold_metrics(model, X_test_scaled, y_test, fit_time)
+
+
+def _run_growing(X, y, bounds, params, trees_per_fold):
+  """Expanding folds in sequence, adding trees fit on each grown window to the forest of the previous fold."""
+  forest = GrowingForest()
+  results = []
+  for i, (train_start, train_end, test_end) in enumerate(bounds):
+    X_test, y_test = X.iloc[train_end:test_end], y.iloc[train_end:test_end]
+
+    start = time.perf_counter()
+    X_train_scaled, _, scaler = scale_features(X.iloc[train_start:train_end], X_test, return_scaler=True)
+    fold_params = params if i == 0 else {**params, 'n_estimators': trees_per_fold}
+    forest.add(scaler, train_model(X_train_scaled, y.iloc[train_start:train_end], **fold_params))
+    fit_time = time.perf_counter() - start
+
+    results.append(_fold_metrics(forest, X_test, y_test, fit_time))
+  return results
+
+
+def walk_forward_evaluate(X, y, min_train=30, test_size=5, window='expanding', train_size=None,
+                          n_jobs=None, reuse_trees=False, trees_per_fold=20, **params):
+  """Walk-forward evaluation with a refit scaler and model per fold; returns one row of metrics per fold."""
+  bounds = list(walk_forward_splits(len(X), min_train, test_size, window, train_size))
+  if not bounds:
+    raise ValueError(f"Need more than {min_train} rows for walk-forward evaluation, got {len(X)}")
+
+  if reuse_trees and window == 'expanding':
+    # Windows only grow, so later folds keep the trees of earlier ones
+    results = _run_growing(X, y, bounds, params, trees_per_fold)
+  else:
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(bounds))
+    tasks = [(fold_bounds, params) for fold_bounds in bounds]
+    if n_jobs == 1:
+      _init_worker(X, y)
+      results = list(map(_run_fold, tasks))
+    else:
+      with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(X, y)) as pool:
+        results = list(pool.map(_run_fold, tasks))
+
+  folds = pd.DataFrame(bounds, columns=['train_start', 'train_end', 'test_end'])
+  folds['test_from'] = X.index[folds['train_end']]
+  return pd.concat([folds, pd.DataFrame(results)], axis=1)